@@ -0,0 +1,239 @@
+# API benchmark: python -m benchmarks.api [--concurrency 16] [--requests 200] [--update-baseline]
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+from typing import Optional
+from uuid import uuid4
+from typer import Typer, Exit
+from benchmarks.common import ROOT, load_baseline, save_baseline, compare, report
+
+typer_app = Typer()
+
+CITIES = ["Moscow", "Kazan", "Samara", "Omsk", "Tomsk", "Perm", "Ufa", "Sochi"]
+
+# The reference query doubles as the learner query, so every solve is a correct answer
+QUERY = (
+    "SELECT c.city, COUNT(*) AS orders, ROUND(SUM(o.total), 2) AS revenue "
+    "FROM orders o JOIN customers c ON c.id = o.customer_id "
+    "GROUP BY c.city ORDER BY revenue DESC"
+)
+
+
+def fixture_database(path: str, rows: int):
+    generator = random.Random(0)
+    with closing(sqlite3.connect(path)) as conn:
+        conn.executescript(
+            "CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, city TEXT);"
+            "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers (id), total REAL);"
+            "CREATE INDEX idx_orders_customer ON orders (customer_id);"
+        )
+        customers = max(1, rows // 10)
+        conn.executemany(
+            "INSERT INTO customers VALUES (?, ?, ?)",
+            [(i, f"customer {i}", generator.choice(CITIES)) for i in range(1, customers + 1)]
+        )
+        conn.executemany(
+            "INSERT INTO orders VALUES (?, ?, ?)",
+            [(i, generator.randint(1, customers), round(generator.uniform(1, 500), 2)) for i in range(1, rows + 1)]
+        )
+        conn.commit()
+
+
+async def create_task(rows: int) -> str:
+    from src.db import Tasks, Level, AnswerMode
+    from src.sandbox import limits_for
+    from src.sandbox.queries import fingerprint_template
+
+    task_id = str(uuid4())
+    os.makedirs("tasks", exist_ok=True)
+    path = os.path.join("tasks", f"{task_id}.sqlite")
+    fixture_database(path, rows)
+    await Tasks.create(
+        id=task_id,
+        name="Revenue by city",
+        description="Benchmark fixture",
+        level=Level.BEGINNER,
+        db_path=path,
+        answer=QUERY,
+        price=10,
+        answer_mode=AnswerMode.RESULT,
+        answer_fingerprint=fingerprint_template(path, QUERY, limits_for(Level.BEGINNER), False, 2),
+        answer_ordered=False,
+        answer_precision=2
+    )
+    return task_id
+
+
+class Phase:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def summary(self) -> dict:
+        samples = sorted(self.latencies)
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 3) if samples else 0.0
+
+        return {
+            "requests": len(samples),
+            "errors": self.errors,
+            "rps": round(len(samples) / self.elapsed, 2) if self.elapsed else 0.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+
+async def run_phase(name: str, jobs: list, concurrency: int) -> tuple[Phase, list]:
+    # jobs are coroutine factories returning (ok, value); concurrency workers drain them in order
+    phase = Phase(name)
+    results = [None] * len(jobs)
+    queue = asyncio.Queue()
+    for index, job in enumerate(jobs):
+        queue.put_nowait((index, job))
+
+    async def worker():
+        while not queue.empty():
+            index, job = queue.get_nowait()
+            started = time.perf_counter()
+            ok, value = await job()
+            phase.latencies.append(time.perf_counter() - started)
+            if ok:
+                results[index] = value
+            else:
+                phase.errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    phase.elapsed = time.perf_counter() - started
+    return phase, results
+
+
+async def benchmark(concurrency: int, requests: int, users: int, rows: int) -> dict:
+    from httpx import ASGITransport, AsyncClient
+    from src.app import app
+
+    phases = {}
+
+    def call(method: str, url: str, token: Optional[str] = None, extract=None, **kwargs):
+        async def job():
+            headers = {"Authorization": f"Bearer {token}"} if token else {}
+            response = await client.request(method, url, headers=headers, **kwargs)
+            if response.status_code >= 400:
+                return False, None
+            return True, extract(response.json()) if extract else None
+        return job
+
+    async def phase(name: str, jobs: list) -> list:
+        result, values = await run_phase(name, jobs, concurrency)
+        phases[name] = result.summary()
+        return values
+
+    async with app.router.lifespan_context(app):
+        task_id = await create_task(rows)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://benchmark") as client:
+            usernames = [f"bench_{uuid4().hex[:12]}" for _ in range(users)]
+            await phase("register", [
+                call("POST", "/auth/register", params={"username": name, "password": "benchmark", "name": name})
+                for name in usernames
+            ])
+            tokens = await phase("login", [
+                call("POST", "/auth/token", data={"username": name, "password": "benchmark"},
+                     extract=lambda body: body["access_token"])
+                for name in usernames
+            ])
+            sessions = [(name, token) for name, token in zip(usernames, tokens) if token]
+            if not sessions:
+                raise RuntimeError("No user could log in, see the register and login phases")
+
+            def spread(count: int) -> list:
+                return [sessions[i % len(sessions)] for i in range(count)]
+
+            solutions = await phase("start", [
+                call("POST", f"/task/start/{task_id}", token, extract=lambda body: body["id"])
+                for _, token in spread(requests)
+            ])
+            started = [(token, solution) for (_, token), solution in zip(spread(requests), solutions) if solution]
+
+            await phase("execute", [
+                call("POST", f"/task/{solution}/execute", token, params={"query": QUERY})
+                for token, solution in started
+            ])
+            await phase("visualize", [
+                call("GET", f"/task/{solution}/visualize", token) for token, solution in started
+            ])
+            await phase("solve", [
+                call("POST", f"/task/solve/{solution}", token, params={"answer": QUERY})
+                for token, solution in started
+            ])
+            await phase("top", [call("GET", "/user/top") for _ in range(requests)])
+            await phase("my_progress", [
+                call("GET", "/task/user/progress", token) for _, token in spread(requests)
+            ])
+            await phase("user_progress", [
+                call("GET", f"/user/progress/{name}") for name, _ in spread(requests)
+            ])
+    return phases
+
+
+@typer_app.command()
+def main(
+    concurrency: int = 16,
+    requests: int = 200,
+    users: Optional[int] = None,
+    rows: int = 5000,
+    bcrypt_rounds: Optional[int] = None,
+    tolerance: float = 0.2,
+    update_baseline: bool = False
+):
+    directory = tempfile.mkdtemp(prefix="learn-benchmark-")
+    # src.config reads the environment on import and every path in the app is relative to the working directory
+    os.environ.update({
+        "DATABASE_URL": f"sqlite://{os.path.join(directory, 'db.sqlite3')}",
+        "TEMP_DIR": os.path.join(directory, "temp_tasks"),
+        "SHARED_STATE_PATH": os.path.join(directory, "shared_state.sqlite3"),
+    })
+    if bcrypt_rounds is not None:
+        os.environ["BCRYPT_ROUNDS"] = str(bcrypt_rounds)
+    os.chdir(directory)
+    sys.path.insert(0, ROOT)
+
+    # one run per process: the lifespan shuts the query and password pools down on exit
+    results = asyncio.run(benchmark(concurrency, requests, users or concurrency, rows))
+    print(f"concurrency={concurrency} requests={requests} rows={rows} data={directory}")
+    baseline = load_baseline("api")
+    report(results, baseline)
+
+    errors = sum(metrics["errors"] for metrics in results.values())
+    if errors:
+        print(f"{errors} requests failed")
+        raise Exit(code=1)
+    if update_baseline:
+        save_baseline("api", results)
+        print("Baseline updated")
+        return
+    if baseline is None:
+        print("No baseline yet, run with --update-baseline to record one")
+        return
+    regressions = compare(
+        {name: {metric: metrics[metric] for metric in ("rps", "p50_ms", "p95_ms", "p99_ms")} for name, metrics in results.items()},
+        baseline,
+        tolerance,
+        higher_is_better=("rps",)
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        raise Exit(code=1)
+
+
+if __name__ == "__main__":
+    typer_app()
@@ -0,0 +1,57 @@
+import json
+import os
+import statistics
+from typing import Optional
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+BASELINES_DIR = os.path.join(BENCHMARKS_DIR, "baselines")
+
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINES_DIR, f"{name}.json")
+
+
+def load_baseline(name: str) -> Optional[dict]:
+    try:
+        with open(baseline_path(name)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(name: str, results: dict):
+    os.makedirs(BASELINES_DIR, exist_ok=True)
+    with open(baseline_path(name), "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def median(samples: list[float]) -> float:
+    return round(statistics.median(samples), 3)
+
+
+def compare(results: dict, baseline: dict, tolerance: float, higher_is_better: tuple = ()) -> list[str]:
+    # results and baseline are {scenario: {metric: value}}; returns one line per regressed metric
+    regressions = []
+    for scenario, metrics in results.items():
+        for metric, value in metrics.items():
+            expected = baseline.get(scenario, {}).get(metric)
+            if not expected:
+                continue
+            if metric in higher_is_better:
+                regressed = value < expected * (1 - tolerance)
+            else:
+                regressed = value > expected * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{scenario}.{metric}: {value} vs baseline {expected}")
+    return regressions
+
+
+def report(results: dict, baseline: Optional[dict]):
+    for scenario, metrics in results.items():
+        print(scenario)
+        for metric, value in metrics.items():
+            expected = (baseline or {}).get(scenario, {}).get(metric)
+            change = f" ({(value - expected) / expected:+.1%} vs baseline)" if expected else ""
+            print(f"  {metric}: {value}{change}")
@@ -0,0 +1,89 @@
+# Cold start benchmark: python -m benchmarks.startup [--runs 5] [--update-baseline]
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typer import Typer, Exit
+from benchmarks.common import ROOT, load_baseline, save_baseline, median, compare, report
+
+typer_app = Typer()
+
+# Runs in a fresh interpreter so module caches from earlier runs don't hide import cost
+PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+from src.app import app
+imported = time.perf_counter()
+
+async def first_request():
+    from httpx import ASGITransport, AsyncClient
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://startup") as client:
+            response = await client.get("/user/top")
+            response.raise_for_status()
+        return ready, time.perf_counter()
+
+ready, answered = asyncio.run(first_request())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "lifespan_ms": (ready - imported) * 1000,
+    "first_request_ms": (answered - started) * 1000,
+}))
+"""
+
+
+def probe(directory: str) -> dict:
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "DATABASE_URL": f"sqlite://{os.path.join(directory, 'db.sqlite3')}",
+        "TEMP_DIR": os.path.join(directory, "temp_tasks"),
+        "SHARED_STATE_PATH": os.path.join(directory, "shared_state.sqlite3"),
+    }
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=directory, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def summarize(samples: list[dict]) -> dict:
+    return {metric: median([sample[metric] for sample in samples]) for metric in samples[0]}
+
+
+@typer_app.command()
+def main(runs: int = 5, tolerance: float = 0.2, update_baseline: bool = False):
+    # cold: a new database every run, so the schema is created; warm: the same database, schema check only
+    cold = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as directory:
+            cold.append(probe(directory))
+    with tempfile.TemporaryDirectory() as directory:
+        probe(directory)
+        warm = [probe(directory) for _ in range(runs)]
+
+    results = {"cold": summarize(cold), "warm": summarize(warm)}
+    baseline = load_baseline("startup")
+    report(results, baseline)
+
+    if update_baseline:
+        save_baseline("startup", results)
+        print("Baseline updated")
+        return
+    if baseline is None:
+        print("No baseline yet, run with --update-baseline to record one")
+        return
+    regressions = compare(results, baseline, tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        raise Exit(code=1)
+
+
+if __name__ == "__main__":
+    typer_app()
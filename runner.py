@@ -1,13 +1,122 @@
-from typer import Typer
+import asyncio
+import os
+from typing import Optional
+from typer import Typer, BadParameter, Exit
 from uvicorn import run
-from src.app import app as fastapi_app
 
 typer_app = Typer()
 
+def configure(**settings):
+    # src.config reads the environment on import, so this has to run before the app is imported
+    for name, value in settings.items():
+        if value is not None:
+            os.environ[name] = str(value)
+
+@typer_app.command()
+def start(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: int = 1,
+    loop: str = "auto",
+    http: str = "auto",
+    db_url: Optional[str] = None,
+    db_pool_size: Optional[int] = None,
+    journal_mode: Optional[str] = None,
+    synchronous: Optional[str] = None,
+    cache_size: Optional[int] = None,
+    mmap_size: Optional[int] = None
+):
+    configure(
+        DATABASE_URL=db_url,
+        DB_POOL_SIZE=db_pool_size,
+        SQLITE_JOURNAL_MODE=journal_mode,
+        SQLITE_SYNCHRONOUS=synchronous,
+        SQLITE_CACHE_SIZE=cache_size,
+        SQLITE_MMAP_SIZE=mmap_size
+    )
+    if workers > 1:
+        from src.config import SANDBOX_BACKEND
+        if SANDBOX_BACKEND == "memory":
+            # in-memory sandboxes live in one process, another worker would not find them
+            raise BadParameter("SANDBOX_BACKEND=memory needs a single worker, use the file backend", param_hint="--workers")
+        from src.db import init_db, close_db
+
+        async def prepare():
+            # migrate once here so the workers don't race each other applying the same migration
+            await init_db()
+            await close_db()
+
+        asyncio.run(prepare())
+    # workers are separate processes, uvicorn needs the import string to load the app in each of them
+    run("src.app:app", host=host, port=port, workers=workers, loop=loop, http=http)
+
+@typer_app.command()
+def check_db(db_url: Optional[str] = None, db_pool_size: Optional[int] = None):
+    configure(DATABASE_URL=db_url, DB_POOL_SIZE=db_pool_size)
+    from tortoise import Tortoise
+    from src.db import init_db, close_db, User
+
+    async def check():
+        await init_db()
+        try:
+            connection = Tortoise.get_connection("default")
+            print(f"Dialect: {connection.capabilities.dialect}")
+            if connection.capabilities.dialect == "sqlite":
+                for pragma in ("journal_mode", "synchronous", "cache_size", "mmap_size", "busy_timeout"):
+                    _, rows = await connection.execute_query(f"PRAGMA {pragma}")
+                    print(f"{pragma}: {rows[0][0]}")
+            print(f"Users: {await User.all().count()}")
+        finally:
+            await close_db()
+
+    asyncio.run(check())
+
+@typer_app.command()
+def backfill_stats(db_url: Optional[str] = None):
+    configure(DATABASE_URL=db_url)
+    from src.db import init_db, close_db
+    from src.services.progress import backfill_user_stats
+
+    async def backfill():
+        await init_db()
+        try:
+            users = await backfill_user_stats()
+        finally:
+            await close_db()
+        print(f"Rebuilt statistics for {users} users")
+
+    asyncio.run(backfill())
+
 @typer_app.command()
-def start():
-    run(fastapi_app)
+def import_tasks(archive: str, db_url: Optional[str] = None):
+    configure(DATABASE_URL=db_url)
+    from src.config import TASKS_DIR
+    from src.db import init_db, close_db, shared_state
+    from src.sandbox import executor
+    from src.services.task_import import import_archive, InvalidArchive
+
+    async def load():
+        await init_db()
+        try:
+            with open(archive, "rb") as source:
+                return await import_archive(source)
+        finally:
+            executor.shutdown()
+            shared_state.shutdown()
+            await close_db()
+
+    os.makedirs(TASKS_DIR, exist_ok=True)
+    try:
+        report = asyncio.run(load())
+    except InvalidArchive as e:
+        raise BadParameter(str(e), param_hint="ARCHIVE")
+    for task in report.imported:
+        print(f"Imported {task.file}: {task.name} ({task.task_id})")
+    for failure in report.failed:
+        print(f"Failed #{failure.index} {failure.file}: {failure.error}")
+    print(f"Imported {len(report.imported)} tasks, {len(report.failed)} failed")
+    if report.failed:
+        raise Exit(code=1)
 
 if __name__ == "__main__":
     typer_app()
-
@@ -1,15 +1,61 @@
+import asyncio
+import os
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from src.db import init_db, close_db
-from src.routers import admin, tasks, auth, user
+from src.config import TEMP_DIR, TASKS_DIR, AVATAR_DIR
+from src.services.metrics import MetricsMiddleware
+from src.services.avatars import AvatarFiles
+
+def include_routers(app: FastAPI):
+    # the routers pull in Tortoise, the models, every schema and the sandbox services, so they are
+    # imported when the app starts serving rather than whenever src.app is imported
+    if getattr(app.state, "routers_included", False):
+        return
+    from src.routers import admin, tasks, auth, user
+
+    app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
+    app.include_router(admin.router, prefix="/admin", tags=["Admin"])
+    app.include_router(tasks.router, prefix="/task", tags=["Tasks"])
+    app.include_router(user.router, prefix="/user", tags=["User"])
+    app.state.routers_included = True
 
 async def lifespan(app: FastAPI):
+    from src.db import init_db, close_db, shared_state
+    from src.sandbox import executor, reaper, pool, cursors
+    from src.security.password import hasher
+    from src.services.leaderboard import leaderboard
+    from src.services.catalog import catalog
+
+    include_routers(app)
+    # directories are created here rather than on import, so importing the app touches nothing on disk
+    for directory in (TEMP_DIR, TASKS_DIR, AVATAR_DIR):
+        os.makedirs(directory, exist_ok=True)
     await init_db()
+    await shared_state.start()
+    await catalog.start()
+    await leaderboard.rebuild()
+    await pool.clear()
+    syncing = asyncio.create_task(shared_state.run_forever())
+    reaping = asyncio.create_task(reaper.run_forever())
+    refilling = asyncio.create_task(pool.run_forever())
+    sweeping = asyncio.create_task(cursors.run_forever())
     yield
+    sweeping.cancel()
+    syncing.cancel()
+    reaping.cancel()
+    refilling.cancel()
+    await pool.clear()
+    executor.shutdown()
+    hasher.shutdown()
+    shared_state.shutdown()
     await close_db()
 
-app = FastAPI(lifespan=lifespan)
+# orjson for every JSON response, the catalog encodes its pages with it too
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Prometheus text format on /metrics, plus per-route latency and ORM query counts for every request
+app.add_middleware(MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,12 +65,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount avatars directory for static file serving
-app.mount("/avatars", StaticFiles(directory="avatars"), name="avatars")
+# Mount avatars directory for static file serving, with ETag and immutable Cache-Control headers
+app.mount("/avatars", AvatarFiles(directory=AVATAR_DIR, check_dir=False), name="avatars")
 
-app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
-app.include_router(admin.router, prefix="/admin", tags=["Admin"])
-app.include_router(tasks.router, prefix="/task", tags=["Tasks"])
-app.include_router(user.router, prefix="/user", tags=["User"])
+# routers are included by the lifespan, see include_routers
 
 
@@ -0,0 +1,94 @@
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+TEMP_DIR = os.getenv("TEMP_DIR", "temp_tasks")
+
+# Uploaded task databases, stored once per content hash
+TASKS_DIR = os.getenv("TASKS_DIR", "tasks")
+TEMPLATE_MAX_BYTES = _env_int("TEMPLATE_MAX_BYTES", 512 * 1024 * 1024)
+# Archive imports check and fingerprint this many templates at once
+IMPORT_WORKERS = _env_int("IMPORT_WORKERS", 4)
+IMPORT_MANIFEST_MAX_BYTES = _env_int("IMPORT_MANIFEST_MAX_BYTES", 16 * 1024 * 1024)
+
+# "file" copies the template for every solution, "memory" deserializes a cached image
+SANDBOX_BACKEND = os.getenv("SANDBOX_BACKEND", "file")
+TEMPLATE_CACHE_BYTES = _env_int("TEMPLATE_CACHE_BYTES", 256 * 1024 * 1024)
+SANDBOX_MEMORY_BYTES = _env_int("SANDBOX_MEMORY_BYTES", 512 * 1024 * 1024)
+SCHEMA_CACHE_SANDBOXES = _env_int("SCHEMA_CACHE_SANDBOXES", 4096)
+
+# Learner SQL runs on a dedicated pool so a slow query can't block the event loop
+QUERY_WORKERS = _env_int("QUERY_WORKERS", 4)
+QUERY_QUEUE_DEPTH = _env_int("QUERY_QUEUE_DEPTH", 64)
+QUERY_TIMEOUT_SECONDS = _env_float("QUERY_TIMEOUT_SECONDS", 5.0)
+
+# Caps for a single execute call, shared by the full, paged and streaming modes
+EXECUTE_MAX_ROWS = _env_int("EXECUTE_MAX_ROWS", 10000)
+EXECUTE_PAGE_SIZE = _env_int("EXECUTE_PAGE_SIZE", 100)
+EXECUTE_MAX_PAGE_SIZE = _env_int("EXECUTE_MAX_PAGE_SIZE", 1000)
+CURSOR_TTL_SECONDS = _env_int("CURSOR_TTL_SECONDS", 120)
+CURSOR_MAX_OPEN = _env_int("CURSOR_MAX_OPEN", 1024)
+# Paged results are read to the end on the first request and held here until fetched or expired
+CURSOR_BUFFER_BYTES = _env_int("CURSOR_BUFFER_BYTES", 256 * 1024 * 1024)
+
+# Verified tokens and loaded users are cached so authenticated requests skip the user table
+AUTH_CACHE_SIZE = _env_int("AUTH_CACHE_SIZE", 10000)
+AUTH_CACHE_TTL_SECONDS = _env_int("AUTH_CACHE_TTL_SECONDS", 60)
+
+# bcrypt runs in a process pool; changing the rounds rehashes passwords on the next login
+BCRYPT_ROUNDS = _env_int("BCRYPT_ROUNDS", 12)
+PASSWORD_WORKERS = _env_int("PASSWORD_WORKERS", max(1, (os.cpu_count() or 2) // 2))
+PASSWORD_QUEUE_DEPTH = _env_int("PASSWORD_QUEUE_DEPTH", 32)
+
+LIST_PAGE_SIZE = _env_int("LIST_PAGE_SIZE", 100)
+LIST_MAX_PAGE_SIZE = _env_int("LIST_MAX_PAGE_SIZE", 500)
+# Encoded /task/all pages kept per catalog version
+CATALOG_CACHE_PAGES = _env_int("CATALOG_CACHE_PAGES", 1024)
+
+# Avatars are re-encoded into square WebP variants named by content hash, so they can be cached forever
+AVATAR_DIR = os.getenv("AVATAR_DIR", "avatars")
+AVATAR_MAX_BYTES = _env_int("AVATAR_MAX_BYTES", 10 * 1024 * 1024)
+AVATAR_MAX_PIXELS = _env_int("AVATAR_MAX_PIXELS", 40_000_000)
+AVATAR_SIZES = tuple(int(size) for size in os.getenv("AVATAR_SIZES", "32,64,256").split(","))
+AVATAR_QUALITY = _env_int("AVATAR_QUALITY", 85)
+AVATAR_CACHE_SECONDS = _env_int("AVATAR_CACHE_SECONDS", 365 * 24 * 60 * 60)
+
+# Main database. SQLite PRAGMAs only apply to sqlite:// URLs, the pool size only to Postgres
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite://db.sqlite3")
+DB_POOL_MIN_SIZE = _env_int("DB_POOL_MIN_SIZE", 1)
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 10)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE = _env_int("SQLITE_CACHE_SIZE", -64000)
+SQLITE_MMAP_SIZE = _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+SQLITE_BUSY_TIMEOUT_MS = _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+
+# Background cleanup of temp_tasks: finished and idle sandboxes go first, then LRU down to the quota
+REAPER_INTERVAL_SECONDS = _env_int("REAPER_INTERVAL_SECONDS", 60)
+SANDBOX_IDLE_TTL_SECONDS = _env_int("SANDBOX_IDLE_TTL_SECONDS", 6 * 60 * 60)
+SANDBOX_DISK_QUOTA_BYTES = _env_int("SANDBOX_DISK_QUOTA_BYTES", 5 * 1024 * 1024 * 1024)
+
+# Spare sandboxes per task, kept at roughly POOL_LEAD_SECONDS worth of recent /task/start traffic
+SANDBOX_POOL_MAX_PER_TASK = _env_int("SANDBOX_POOL_MAX_PER_TASK", 8)
+SANDBOX_POOL_LEAD_SECONDS = _env_float("SANDBOX_POOL_LEAD_SECONDS", 30.0)
+SANDBOX_POOL_HALF_LIFE_SECONDS = _env_float("SANDBOX_POOL_HALF_LIFE_SECONDS", 300.0)
+SANDBOX_POOL_REFILL_SECONDS = _env_float("SANDBOX_POOL_REFILL_SECONDS", 5.0)
+
+# Node-local SQLite store shared by all uvicorn workers: version counters, an invalidation log and leases.
+# Result cursors stay per worker, a page request that lands on another worker gets 410 and reruns the query.
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "shared_state.sqlite3")
+SHARED_STATE_POLL_SECONDS = _env_float("SHARED_STATE_POLL_SECONDS", 0.5)
+SHARED_STATE_RETENTION_SECONDS = _env_int("SHARED_STATE_RETENTION_SECONDS", 3600)
+
+# Learner queries slower than this are aggregated per task and normalized SQL for /admin/queries/slow
+SLOW_QUERY_MS = _env_float("SLOW_QUERY_MS", 250.0)
+SLOW_QUERY_LOG_SIZE = _env_int("SLOW_QUERY_LOG_SIZE", 500)
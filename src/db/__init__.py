@@ -1,16 +1,51 @@
 from tortoise import Tortoise
+from tortoise.backends.base.config_generator import expand_db_url
+from src.config import DATABASE_URL, DB_POOL_MIN_SIZE, DB_POOL_SIZE, SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, \
+                       SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE, SQLITE_BUSY_TIMEOUT_MS, \
+                       SHARED_STATE_PATH, SHARED_STATE_POLL_SECONDS, SHARED_STATE_RETENTION_SECONDS
 from .models.results import Results
 from .models.tasks import Tasks
 from .models.solution import Solution
 from .models.user import User
-from .models.base import Status, Level
+from .models.stats import UserStats
+from .models.base import Status, Level, AnswerMode
+from .migrations import migrate, current_version, SCHEMA_VERSION
+from .shared import SharedState
 
-async def init_db():
+shared_state = SharedState(
+    SHARED_STATE_PATH,
+    poll_interval=SHARED_STATE_POLL_SECONDS,
+    retention=SHARED_STATE_RETENTION_SECONDS
+)
+
+def database_connection(db_url: str = DATABASE_URL) -> dict:
+    connection = expand_db_url(db_url)
+    credentials = connection["credentials"]
+    if connection["engine"] == "tortoise.backends.sqlite":
+        # every extra sqlite credential is applied as a PRAGMA when the connection opens
+        credentials.update(
+            journal_mode=SQLITE_JOURNAL_MODE,
+            synchronous=SQLITE_SYNCHRONOUS,
+            cache_size=SQLITE_CACHE_SIZE,
+            mmap_size=SQLITE_MMAP_SIZE,
+            busy_timeout=SQLITE_BUSY_TIMEOUT_MS,
+        )
+    else:
+        credentials.setdefault("minsize", DB_POOL_MIN_SIZE)
+        credentials.setdefault("maxsize", DB_POOL_SIZE)
+    return connection
+
+async def init_db(db_url: str = DATABASE_URL):
     await Tortoise.init(
-        db_url="sqlite://db.sqlite3", 
-        modules={"models": ["src.db"]},
+        config={
+            "connections": {"default": database_connection(db_url)},
+            "apps": {"models": {"models": ["src.db"], "default_connection": "default"}},
+        }
     )
-    await Tortoise.generate_schemas()
+    # an up to date database skips generate_schemas, which introspects every model on each start
+    if await current_version(Tortoise.get_connection("default")) < SCHEMA_VERSION:
+        await Tortoise.generate_schemas()
+        await migrate()
 
 async def close_db():
     await Tortoise.close_connections()
@@ -0,0 +1,161 @@
+import os
+from datetime import datetime, timezone
+from uuid import uuid4
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+from .models.base import Level
+from .models.stats import UserStats
+
+
+async def _columns(conn, table: str) -> set[str]:
+    if conn.capabilities.dialect == "sqlite":
+        _, rows = await conn.execute_query(f'PRAGMA table_info("{table}")')
+    else:
+        _, rows = await conn.execute_query(
+            "SELECT column_name AS name FROM information_schema.columns WHERE table_name = $1", [table]
+        )
+    return {row["name"] for row in rows}
+
+
+async def _add_columns(conn, table: str, columns: dict[str, tuple[str, str]]):
+    # columns: name -> (sqlite type, postgres type)
+    existing = await _columns(conn, table)
+    sqlite = conn.capabilities.dialect == "sqlite"
+    for name, (sqlite_type, postgres_type) in columns.items():
+        if name not in existing:
+            await conn.execute_script(
+                f'ALTER TABLE "{table}" ADD COLUMN "{name}" {sqlite_type if sqlite else postgres_type}'
+            )
+
+
+async def task_answer_modes(conn):
+    await _add_columns(conn, "tasks", {
+        "answer_mode": ("VARCHAR(6) NOT NULL DEFAULT 'text'", "VARCHAR(6) NOT NULL DEFAULT 'text'"),
+        "answer_fingerprint": ("VARCHAR(64)", "VARCHAR(64)"),
+        "answer_ordered": ("INT NOT NULL DEFAULT 0", "BOOL NOT NULL DEFAULT FALSE"),
+        "answer_precision": ("INT", "INT"),
+    })
+
+
+async def solution_ownership(conn):
+    await _add_columns(conn, "solution", {
+        "user_id": (
+            'CHAR(36) REFERENCES "user" ("id") ON DELETE CASCADE',
+            'UUID REFERENCES "user" ("id") ON DELETE CASCADE',
+        ),
+        "created_at": ("TIMESTAMP", "TIMESTAMPTZ"),
+        "last_activity_at": ("TIMESTAMP", "TIMESTAMPTZ"),
+    })
+    await conn.execute_script('UPDATE "solution" SET "created_at" = CURRENT_TIMESTAMP WHERE "created_at" IS NULL')
+
+
+async def hot_path_indexes(conn):
+    await conn.execute_script(
+        'CREATE INDEX IF NOT EXISTS "idx_results_user_points" ON "results" ("user_id", "points_earned");'
+    )
+    await conn.execute_script(
+        'CREATE INDEX IF NOT EXISTS "idx_solution_user_status" ON "solution" ("user_id", "status", "last_activity_at");'
+    )
+
+
+async def task_template_hashes(conn):
+    await _add_columns(conn, "tasks", {"template_hash": ("VARCHAR(64)", "VARCHAR(64)")})
+    await conn.execute_script('CREATE INDEX IF NOT EXISTS "idx_tasks_template_hash" ON "tasks" ("template_hash");')
+    # tasks uploaded before the content-addressed store keep their file, only the hash is filled in
+    from src.sandbox.templates import file_hash
+    _, rows = await conn.execute_query('SELECT "id", "db_path" FROM "tasks" WHERE "template_hash" IS NULL')
+    for row in rows:
+        if row["db_path"] and os.path.exists(row["db_path"]):
+            await conn.execute_query(
+                'UPDATE "tasks" SET "template_hash" = ? WHERE "id" = ?'
+                if conn.capabilities.dialect == "sqlite" else
+                'UPDATE "tasks" SET "template_hash" = $1 WHERE "id" = $2',
+                [file_hash(row["db_path"]), row["id"]]
+            )
+
+
+async def user_revisions(conn):
+    await _add_columns(conn, "user", {"revision": ("VARCHAR(32) NOT NULL DEFAULT ''", "VARCHAR(32) NOT NULL DEFAULT ''")})
+
+
+async def user_stats_backfill(conn) -> int:
+    # databases from before UserStats have the completions only in results, the table is rebuilt from there;
+    # runner.py backfill-stats calls this too
+    _, rows = await conn.execute_query(
+        'SELECT "results"."user_id" AS "user_id", "tasks"."level" AS "level", '
+        'COUNT(*) AS "completed", SUM("results"."points_earned") AS "points" '
+        'FROM "results" JOIN "tasks" ON "tasks"."id" = "results"."task_id" '
+        'WHERE "results"."points_earned" > 0 GROUP BY "results"."user_id", "tasks"."level"'
+    )
+    columns = ["total_points", "total_completed", *UserStats.LEVEL_FIELDS.values()]
+    totals = {}
+    for row in rows:
+        stats = totals.setdefault(str(row["user_id"]), dict.fromkeys(columns, 0))
+        stats["total_points"] += row["points"]
+        stats["total_completed"] += row["completed"]
+        stats[UserStats.LEVEL_FIELDS[Level(row["level"])]] += row["completed"]
+
+    sqlite = conn.capabilities.dialect == "sqlite"
+    names = ", ".join(f'"{name}"' for name in ["id", "user_id", *columns])
+    placeholders = ", ".join("?" if sqlite else f"${number}" for number in range(1, len(columns) + 3))
+    await conn.execute_script('DELETE FROM "userstats"')
+    for user_id, stats in totals.items():
+        await conn.execute_query(
+            f'INSERT INTO "userstats" ({names}) VALUES ({placeholders})',
+            [str(uuid4()), user_id, *stats.values()]
+        )
+    # progress ETags are taken from the revision, and any user's stats may have just changed
+    await conn.execute_query(
+        'UPDATE "user" SET "revision" = ?' if sqlite else 'UPDATE "user" SET "revision" = $1',
+        [uuid4().hex]
+    )
+    return len(totals)
+
+
+async def task_answer_text(conn):
+    # reference queries outgrew VARCHAR(128); SQLite never enforced the length, Postgres needs the type changed
+    if conn.capabilities.dialect != "sqlite":
+        await conn.execute_script('ALTER TABLE "tasks" ALTER COLUMN "answer" TYPE TEXT')
+
+
+# (version, name, migration); append only, never renumber.
+# init_db only runs generate_schemas when this list is ahead of the database, so a new model needs an entry too.
+MIGRATIONS = [
+    (1, "task answer modes", task_answer_modes),
+    (2, "solution ownership and timestamps", solution_ownership),
+    (3, "hot path indexes", hot_path_indexes),
+    (4, "task template hashes", task_template_hashes),
+    (5, "user revisions", user_revisions),
+    (6, "user stats backfill", user_stats_backfill),
+    (7, "task answer text", task_answer_text),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+async def current_version(conn) -> int:
+    await conn.execute_script(
+        'CREATE TABLE IF NOT EXISTS "schema_migrations" ('
+        '"version" INT PRIMARY KEY, "name" VARCHAR(128) NOT NULL, "applied_at" VARCHAR(32) NOT NULL)'
+    )
+    _, rows = await conn.execute_query('SELECT MAX("version") AS "version" FROM "schema_migrations"')
+    return rows[0]["version"] or 0
+
+
+async def migrate() -> list[int]:
+    conn = Tortoise.get_connection("default")
+    version = await current_version(conn)
+    applied = []
+    for number, name, migration in MIGRATIONS:
+        if number <= version:
+            continue
+        async with in_transaction() as transaction:
+            await migration(transaction)
+            await transaction.execute_query(
+                'INSERT INTO "schema_migrations" ("version", "name", "applied_at") VALUES (?, ?, ?)'
+                if transaction.capabilities.dialect == "sqlite" else
+                'INSERT INTO "schema_migrations" ("version", "name", "applied_at") VALUES ($1, $2, $3)',
+                [number, name, datetime.now(timezone.utc).isoformat()]
+            )
+        applied.append(number)
+    return applied
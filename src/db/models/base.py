@@ -10,4 +10,8 @@ class Level(Enum):
 class Status(Enum):
     START = "started"
     SOLVE = "solve"
-    FINISH = "finish"
\ No newline at end of file
+    FINISH = "finish"
+
+class AnswerMode(Enum):
+    TEXT = "text"
+    RESULT = "result"
\ No newline at end of file
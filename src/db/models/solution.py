@@ -5,4 +5,7 @@ from .tasks import Tasks
 class Solution(Model):
     id = fields.UUIDField(pk=True)
     task = fields.ForeignKeyField("models.Tasks", related_name="solution")
-    status = fields.CharEnumField(Status)
\ No newline at end of file
+    user = fields.ForeignKeyField("models.User", related_name="solutions", null=True)
+    status = fields.CharEnumField(Status)
+    created_at = fields.DatetimeField(auto_now_add=True, null=True)
+    last_activity_at = fields.DatetimeField(null=True)
\ No newline at end of file
@@ -0,0 +1,27 @@
+from tortoise import Model, fields
+from .base import Level
+
+
+# Агрегированная статистика пользователя, обновляется вместе с Results в solve_task
+class UserStats(Model):
+    id = fields.UUIDField(pk=True)
+    user = fields.OneToOneField("models.User", related_name="stats")
+    total_points = fields.IntField(default=0)
+    total_completed = fields.IntField(default=0)
+    beginner_completed = fields.IntField(default=0)
+    intermediate_completed = fields.IntField(default=0)
+    advanced_completed = fields.IntField(default=0)
+    expert_completed = fields.IntField(default=0)
+    master_completed = fields.IntField(default=0)
+
+    LEVEL_FIELDS = {
+        Level.BEGINNER: "beginner_completed",
+        Level.INTERMEDIATE: "intermediate_completed",
+        Level.ADVANCED: "advanced_completed",
+        Level.EXPERT: "expert_completed",
+        Level.MASTER: "master_completed",
+    }
+
+    def tasks_by_level(self) -> dict:
+        counts = {level: getattr(self, field) for level, field in self.LEVEL_FIELDS.items()}
+        return {level: count for level, count in counts.items() if count}
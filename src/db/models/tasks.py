@@ -1,5 +1,5 @@
 from tortoise import Model, fields
-from .base import Level
+from .base import Level, AnswerMode
 
 
 # Модель для задач
@@ -9,5 +9,17 @@ class Tasks(Model):
     description = fields.TextField()
     level = fields.CharEnumField(Level)
     db_path = fields.CharField(max_length=128, default="")
-    answer = fields.CharField(max_length=128)
-    price = fields.IntField(default=0)
\ No newline at end of file
+    # sha256 файла шаблона: одинаковые загрузки хранятся одним файлом tasks/<hash>.sqlite
+    template_hash = fields.CharField(max_length=64, null=True)
+    answer = fields.TextField()
+    price = fields.IntField(default=0)
+    # В режиме RESULT answer хранит эталонный запрос, а сравнивается хэш его результата
+    answer_mode = fields.CharEnumField(AnswerMode, default=AnswerMode.TEXT)
+    answer_fingerprint = fields.CharField(max_length=64, null=True)
+    answer_ordered = fields.BooleanField(default=False)
+    answer_precision = fields.IntField(null=True)
+
+    # Кэши шаблонов и пул песочниц разделяются между задачами с одинаковым шаблоном
+    @property
+    def template_key(self) -> str:
+        return self.template_hash or str(self.id)
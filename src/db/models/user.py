@@ -1,3 +1,4 @@
+from uuid import uuid4
 from tortoise import Model, fields
 from .base import Level
 
@@ -11,4 +12,13 @@ class User(Model):
     points = fields.IntField()
     is_admin = fields.BooleanField(default=False)
     level = fields.CharEnumField(Level)
-    password = fields.TextField()
\ No newline at end of file
+    password = fields.TextField()
+    # Меняется при каждом сохранении, по нему строятся ETag профиля и прогресса
+    revision = fields.CharField(max_length=32, default="")
+
+    async def save(self, *args, update_fields=None, **kwargs):
+        # случайное значение, а не счётчик: устаревшие копии пользователя в других воркерах не дадут совпадений
+        self.revision = uuid4().hex
+        if update_fields is not None:
+            update_fields = [*update_fields, "revision"]
+        await super().save(*args, update_fields=update_fields, **kwargs)
\ No newline at end of file
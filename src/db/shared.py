@@ -0,0 +1,168 @@
+import asyncio
+import inspect
+import logging
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    origin INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_created ON events (created);
+CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder INTEGER NOT NULL, expires REAL NOT NULL);
+"""
+
+# Old events are pruned once every this many polls
+PRUNE_EVERY = 100
+
+
+# Node-local store that keeps per-worker caches coherent when uvicorn runs several processes
+class SharedState:
+    def __init__(self, path: str, poll_interval: float, retention: float):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._conn = None
+        self._pid = None
+        self._thread = None
+        self._handlers: dict[str, list[Callable]] = defaultdict(list)
+        self._last_event = 0
+        self.polls = 0
+        self.published = 0
+        self.received = 0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # every statement runs on one thread of its own: the event loop never waits on the file lock
+        # or an fsync, and events go out in the order they were published
+        if self._thread is None or self._pid != os.getpid():
+            self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-state")
+            self._conn, self._pid = None, os.getpid()
+        return self._thread
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+
+    def _connection(self) -> sqlite3.Connection:
+        # connections don't survive a fork, every worker opens its own
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def version(self, name: str) -> int:
+        return await self._run(self._version, name)
+
+    def _version(self, name: str) -> int:
+        row = self._connection().execute("SELECT value FROM versions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    async def bump(self, name: str) -> int:
+        return await self._run(self._bump, name)
+
+    def _bump(self, name: str) -> int:
+        return self._connection().execute(
+            "INSERT INTO versions (name, value) VALUES (?, 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1 RETURNING value",
+            (name,)
+        ).fetchall()[0][0]
+
+    async def lease(self, name: str, ttl: float) -> bool:
+        return await self._run(self._lease, name, ttl)
+
+    def _lease(self, name: str, ttl: float) -> bool:
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO leases (name, holder, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires = excluded.expires "
+            "WHERE leases.holder = excluded.holder OR leases.expires < ?",
+            (name, os.getpid(), now + ttl, now)
+        )
+        return cursor.rowcount == 1
+
+    def subscribe(self, kind: str, handler: Callable):
+        self._handlers[kind].append(handler)
+
+    def publish(self, kind: str, payload: str):
+        # callers only announce a change they already made, so nobody waits for the insert
+        self._executor().submit(self._publish, kind, payload, time.time()).add_done_callback(_log_failure)
+
+    def _publish(self, kind: str, payload: str, created: float):
+        self._connection().execute(
+            "INSERT INTO events (kind, payload, origin, created) VALUES (?, ?, ?, ?)",
+            (kind, payload, os.getpid(), created)
+        )
+        self.published += 1
+
+    async def start(self):
+        # only events published after this worker came up are interesting
+        self._last_event = await self._run(self._latest_event)
+
+    def _latest_event(self) -> int:
+        return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def _fetch(self, after: int) -> list:
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT id, kind, payload, origin FROM events WHERE id > ? ORDER BY id", (after,)
+        ).fetchall()
+        self.polls += 1
+        if self.polls % PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM events WHERE created < ?", (time.time() - self.retention,))
+        return rows
+
+    async def poll(self):
+        rows = await self._run(self._fetch, self._last_event)
+        for event_id, kind, payload, origin in rows:
+            self._last_event = event_id
+            if origin == os.getpid():
+                continue
+            self.received += 1
+            for handler in self._handlers.get(kind, ()):
+                result = handler(payload)
+                if inspect.isawaitable(result):
+                    await result
+
+    async def run_forever(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Shared state poll failed")
+
+    def shutdown(self):
+        # waits for publishes still queued, other workers should see them
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.shutdown(wait=True)
+            self._thread = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "last_event": self._last_event,
+            "published": self.published,
+            "received": self.received,
+            "polls": self.polls,
+        }
+
+
+def _log_failure(future: Future):
+    if future.exception() is not None:
+        logger.error("Shared state publish failed", exc_info=future.exception())
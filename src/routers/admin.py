@@ -1,31 +1,58 @@
-from fastapi import APIRouter, UploadFile, HTTPException, Depends
-from uuid import uuid4
+from fastapi import APIRouter, UploadFile, HTTPException, Depends, Query
+from uuid import uuid4, UUID
+from typing import Optional
 import os
+import sqlite3
+from src.db import shared_state
 from src.db.models.tasks import Tasks
-from src.schemas.tasks import UploadTaskSchema, UploadTaskResponseSchema
-from src.security.middleware import JWTBearer
+from src.db.models.base import AnswerMode
+from src.schemas.tasks import UploadTaskSchema, UploadTaskResponseSchema, ImportTasksResponseSchema
+from src.schemas.admin import StatsResponseSchema, SlowQueriesResponseSchema
+from src.security.middleware import JWTBearer, principal_cache
+from src.security.password import hasher
+from src.sandbox import sandboxes, pool, schema_cache, executor, cursors, reaper, slow_queries, template_store, limits_for, \
+                        ExecutorSaturated, QueryTimeout, BudgetExceeded, InvalidTemplate, TemplateTooLarge
+from src.sandbox.queries import fingerprint_template
+from src.services.task_import import import_archive, InvalidArchive
+from src.services.catalog import catalog
 
 router = APIRouter()
 
 admin_auth = JWTBearer(admin_required=True)
 
-TASKS_DIR = "tasks"
-
 @router.post("/upload-task/", response_model=UploadTaskResponseSchema)
 async def upload_task(
     file: UploadFile, 
     task_data: UploadTaskSchema = Depends(),
     user = Depends(admin_auth)
 ):
-    os.makedirs(TASKS_DIR, exist_ok=True)
-
-    task_id = str(uuid4())
+    try:
+        template_hash, file_path = await template_store.save(file)
+    except TemplateTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidTemplate as e:
+        raise HTTPException(status_code=400, detail=f"Invalid task database: {e}")
 
-    file_path = os.path.join(TASKS_DIR, f"{task_id}.sqlite")
+    try:
+        await executor.run(schema_cache.template, template_hash, file_path)
+    except (ExecutorSaturated, sqlite3.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid task database: {e}")
 
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+    answer_fingerprint = None
+    if task_data.answer_mode == AnswerMode.RESULT:
+        try:
+            answer_fingerprint = await executor.run(
+                fingerprint_template,
+                file_path,
+                task_data.answer,
+                limits_for(task_data.level),
+                task_data.answer_ordered,
+                task_data.answer_precision
+            )
+        except (ExecutorSaturated, QueryTimeout, BudgetExceeded, sqlite3.Error) as e:
+            raise HTTPException(status_code=400, detail=f"Reference query failed: {e}")
 
+    task_id = str(uuid4())
     try:
         task = await Tasks.create(
             id=task_id,
@@ -33,10 +60,62 @@ async def upload_task(
             description=task_data.description,
             level=task_data.level,
             db_path=file_path,
+            template_hash=template_hash,
             answer=task_data.answer,
-            price=task_data.price
+            price=task_data.price,
+            answer_mode=task_data.answer_mode,
+            answer_fingerprint=answer_fingerprint,
+            answer_ordered=task_data.answer_ordered,
+            answer_precision=task_data.answer_precision
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error saving task: {e}")
+    await catalog.invalidate()
+
+    return UploadTaskResponseSchema(task_id=task_id, message="Task uploaded successfully")
+
+@router.post("/import-tasks/", response_model=ImportTasksResponseSchema)
+async def import_tasks(file: UploadFile, user = Depends(admin_auth)):
+    # entries that fail are reported back, the rest are inserted together
+    try:
+        return await import_archive(file.file)
+    except InvalidArchive as e:
+        raise HTTPException(status_code=400, detail=f"Invalid archive: {e}")
+
+@router.get("/sandbox/stats", response_model=StatsResponseSchema)
+async def sandbox_stats(user = Depends(admin_auth)):
+    return StatsResponseSchema(stats={
+        **sandboxes.stats(),
+        "schema_cache": schema_cache.stats(),
+        "executor": executor.stats(),
+        "cursors": cursors.stats(),
+        "reaper": reaper.stats(),
+        "pool": pool.stats(),
+        "slow_queries": slow_queries.stats(),
+    })
+
+@router.get("/catalog/stats", response_model=StatsResponseSchema)
+async def catalog_stats(user = Depends(admin_auth)):
+    return StatsResponseSchema(stats=catalog.stats())
+
+@router.get("/auth/stats", response_model=StatsResponseSchema)
+async def auth_stats(user = Depends(admin_auth)):
+    return StatsResponseSchema(stats={**principal_cache.stats(), "hasher": hasher.stats(), "shared_state": shared_state.stats()})
+
+@router.get("/queries/slow", response_model=SlowQueriesResponseSchema)
+async def slow_query_log(
+    task_id: Optional[UUID] = None,
+    limit: int = Query(50, ge=1, le=500),
+    user = Depends(admin_auth)
+):
+    # the log is kept per worker process
+    return SlowQueriesResponseSchema(
+        threshold_ms=slow_queries.threshold_ms,
+        worker=os.getpid(),
+        queries=slow_queries.entries(str(task_id) if task_id else None, limit)
+    )
 
-    return UploadTaskResponseSchema(task_id=task_id, message="Task uploaded successfully")
\ No newline at end of file
+@router.delete("/queries/slow", response_model=StatsResponseSchema)
+async def clear_slow_query_log(user = Depends(admin_auth)):
+    slow_queries.clear()
+    return StatsResponseSchema(stats=slow_queries.stats())
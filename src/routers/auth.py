@@ -2,9 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
 from uuid import uuid4
+import time
 
 from src.db import User, Level
-from src.security.password import verify_password, get_password_hash
+from src.security.password import hasher, HasherBusy
+from src.security.middleware import principal_cache
+from src.services.leaderboard import leaderboard
 from src.security.jwt import create_access_token, Token, ACCESS_TOKEN_EXPIRE_MONTHS
 from src.schemas.user import UserResponseSchema
 
@@ -12,18 +15,31 @@ router = APIRouter()
 
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+    started = time.perf_counter()
     user = await User.get_or_none(username=form_data.username)
-    if not user or not verify_password(form_data.password, user.password):
+    valid, new_hash = False, None
+    if user:
+        try:
+            valid, new_hash = await hasher.verify(form_data.password, user.password)
+        except HasherBusy as e:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    if new_hash:
+        user.password = new_hash
+        await user.save(update_fields=["password"])
+        principal_cache.invalidate(user.username)
     
     access_token = create_access_token(
         data={"sub": user.username},
         expires_delta=timedelta(minutes=60*24*31*ACCESS_TOKEN_EXPIRE_MONTHS)
     )
+    hasher.latency["login"].record(time.perf_counter() - started)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=UserResponseSchema)
@@ -34,7 +50,10 @@ async def register_user(username: str, password: str, name: str):
             detail="Username already registered"
         )
     
-    hashed_password = get_password_hash(password)
+    try:
+        hashed_password = await hasher.hash(password)
+    except HasherBusy as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     user = await User.create(
         id=uuid4(),
         username=username,
@@ -45,6 +64,7 @@ async def register_user(username: str, password: str, name: str):
         points=0,
         level=Level.BEGINNER
     )
+    leaderboard.upsert(user)
     
     return UserResponseSchema(
         name=user.name,
@@ -1,84 +1,105 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse, Response
 import sqlite3
-import os
-import shutil
+from starlette.concurrency import run_in_threadpool
+from contextlib import contextmanager
+from typing import Optional
 from uuid import uuid4, UUID
-from collections import defaultdict
-from src.db import Tasks, Solution, Status, Results, Level
+from tortoise.transactions import in_transaction
+from tortoise import timezone
+from tortoise.expressions import F
+from src.db import Tasks, Solution, Status, Results, Level, AnswerMode, User
 from src.schemas.tasks import ExecuteQueryResponseSchema, \
+                              ResultMode, \
                               VisualizeDatabaseResponseSchema, \
                               GetTaskResponseSchema, \
                               Task, \
                               AllTasksResponseSchema, \
                               SolutionResponseSchema, \
+                              ActiveSolutionSchema, \
+                              ActiveSolutionsResponseSchema, \
                               SolveResponseSchema, \
                               ResultResponseSchema, \
-                              UserTaskStatistics, \
                               UserProgressResponse
 from src.schemas.user import UserResponseSchema
-from src.security.middleware import JWTBearer
+from src.security.middleware import JWTBearer, principal_cache
+from src.services.leaderboard import leaderboard
+from src.services import progress
+from src.services.pagination import parse_fields
+from src.services.catalog import catalog, TASK_FIELDS
+from src.services.etag import ETag
+from src.sandbox import sandboxes, pool, schema_cache, executor, cursors, limits_for, \
+                        ExecutorSaturated, QueryTimeout, CursorExpired, BudgetExceeded
+from src.sandbox.queries import run_query, open_cursor, page_query, explain_query, stream_rows, fingerprint_solution
+from src.config import EXECUTE_PAGE_SIZE, EXECUTE_MAX_PAGE_SIZE, LIST_PAGE_SIZE, LIST_MAX_PAGE_SIZE
 
 router = APIRouter()
-TEMP_DIR = "temp_tasks"
-
-os.makedirs(TEMP_DIR, exist_ok=True)
 
 user_auth = JWTBearer()
 
-@router.get("/all", response_model=AllTasksResponseSchema)
-async def get_all_tasks():
-    tasks = await Tasks.all()
-    result = [Task(id=task.id, level=task.level, db_path=task.db_path, price=task.price, name=task.name, description=task.description) for task in tasks]
-    return {"result": result}
+@contextmanager
+def sql_errors():
+    try:
+        yield
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except QueryTimeout as e:
+        raise HTTPException(status_code=408, detail=f"SQL Error: {e}")
+    except BudgetExceeded as e:
+        raise HTTPException(status_code=400, detail=f"SQL Error: {e}")
+    except CursorExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=400, detail=f"SQL Error: {e}")
+
+@router.get("/all", response_model=AllTasksResponseSchema, response_model_exclude_unset=True)
+async def get_all_tasks(
+    cursor: Optional[UUID] = None,
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE),
+    level: Optional[Level] = None,
+    fields: Optional[str] = None,
+    etag: ETag = Depends()
+):
+    fields = parse_fields(fields, TASK_FIELDS, key="id")
+    if (not_modified := etag.check(catalog.version)) is not None:
+        return not_modified
+    # already encoded bytes from the catalog cache, response_model is only there for the docs
+    body = await catalog.page(
+        cursor=str(cursor) if cursor else None,
+        limit=limit,
+        level=level,
+        fields=fields
+    )
+    return Response(body, media_type="application/json", headers=etag.headers)
 
 @router.get("/user/progress", response_model=UserProgressResponse)
 async def get_user_progress(user = Depends(user_auth)):
-    completed_results = await Results.filter(
+    return await progress.get_user_progress(user)
+
+@router.get("/my/active", response_model=ActiveSolutionsResponseSchema)
+async def get_active_solutions(user = Depends(user_auth)):
+    solutions = await Solution.filter(
         user=user,
-        points_earned__gt=0
-    ).prefetch_related('task')
-    
-    total_points = sum(result.points_earned for result in completed_results)
-    
-    tasks_by_level = defaultdict(int)
-    for result in completed_results:
-        tasks_by_level[result.task.level] += 1
-    
-    recent_results = await Results.filter(
-        user=user
-    ).limit(10).prefetch_related('task')
+        status__in=[Status.START, Status.SOLVE]
+    ).order_by("-last_activity_at").select_related("task")
 
-    recent_results_schema = [
-        ResultResponseSchema(
-            id=result.id,
+    return ActiveSolutionsResponseSchema(solutions=[
+        ActiveSolutionSchema(
+            id=solution.id,
             task=Task(
-                id=result.task.id,
-                name=result.task.name,
-                description=result.task.description,
-                level=result.task.level,
-                db_path=result.task.db_path,
-                price=result.task.price
-            ),
-            user=UserResponseSchema(
-                name=user.name,
-                username=user.username,
-                description=user.description,
-                avatar=user.avatar,
-                points=user.points
+                id=solution.task.id,
+                level=solution.task.level,
+                db_path=solution.task.db_path,
+                price=solution.task.price,
+                name=solution.task.name,
+                description=solution.task.description
             ),
-            points_earned=result.points_earned
+            status=solution.status,
+            created_at=solution.created_at,
+            last_activity_at=solution.last_activity_at
         )
-        for result in recent_results
-    ]
-
-    statistics = UserTaskStatistics(
-        total_tasks_completed=len(completed_results),
-        total_points_earned=total_points,
-        tasks_by_level=dict(tasks_by_level),
-        recent_results=recent_results_schema
-    )
-
-    return UserProgressResponse(statistics=statistics)
+        for solution in solutions
+    ])
 
 @router.post("/start/{task_id}", response_model=SolutionResponseSchema)
 async def create_solution(task_id: UUID, user = Depends(user_auth)):
@@ -90,11 +111,13 @@ async def create_solution(task_id: UUID, user = Depends(user_auth)):
     solution = await Solution.create(
         id=id,
         task=task,
-        status=Status.START
+        user=user,
+        status=Status.START,
+        last_activity_at=timezone.now()
     )
 
-    temp_file_path = os.path.join(TEMP_DIR, f"{id}.sqlite")
-    shutil.copy(task.db_path, temp_file_path)
+    await pool.provision(id, task.template_key, task.db_path)
+    await run_in_threadpool(schema_cache.bind, id, task.template_key, task.db_path)
 
     return SolutionResponseSchema(
         id=solution.id,
@@ -128,67 +151,84 @@ async def get_solution(task_id: UUID, user = Depends(user_auth)):
     )
 
 @router.post("/{task_id}/execute", response_model=ExecuteQueryResponseSchema)
-async def execute_query(task_id: UUID, query: str, user = Depends(user_auth)):
-    solution = await Solution.get_or_none(id=task_id)
+async def execute_query(
+    task_id: UUID,
+    query: str,
+    mode: ResultMode = ResultMode.ALL,
+    page_size: int = Query(EXECUTE_PAGE_SIZE, ge=1, le=EXECUTE_MAX_PAGE_SIZE),
+    user = Depends(user_auth)
+):
+    solution = await Solution.get_or_none(id=task_id).select_related("task")
     if not solution:
         raise HTTPException(status_code=404, detail="Solution not found")
 
-    temp_file_path = os.path.join(TEMP_DIR, f"{task_id}.sqlite")
-    if not os.path.exists(temp_file_path):
+    if not sandboxes.exists(task_id):
         raise HTTPException(status_code=404, detail="Temporary task file not found")
 
     if solution.status == Status.FINISH:
         raise HTTPException(status_code=403, detail="Solution is finished")
 
     solution.status = Status.SOLVE
-    await solution.save()
+    solution.last_activity_at = timezone.now()
+    await solution.save(update_fields=["status", "last_activity_at"])
 
-    try:
-        with sqlite3.connect(temp_file_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(query)
-            result = cursor.fetchall()
-            conn.commit()
-    except sqlite3.Error as e:
-        raise HTTPException(status_code=400, detail=f"SQL Error: {e}")
+    limits = limits_for(solution.task.level)
+    template_id = str(solution.task.id)
+    with sql_errors():
+        if mode == ResultMode.ALL:
+            cursor, result = await executor.run(run_query, task_id, query, limits, template_id)
+            return {"result": result, "columns": cursor.columns, "truncated": cursor.truncated, "cost": cursor.budget.cost()}
+
+        if mode == ResultMode.EXPLAIN:
+            plan, columns, cost = await executor.run(explain_query, task_id, query, limits, template_id)
+            return {"result": [], "columns": columns, "plan": plan, "cost": cost}
+
+        if mode == ResultMode.STREAM:
+            cursor = await executor.run(open_cursor, task_id, query, limits, template_id)
+            return StreamingResponse(stream_rows(cursor, page_size), media_type="application/x-ndjson")
+
+        cursor, result = await executor.run(page_query, task_id, query, limits, page_size, template_id)
 
-    return {"result": result}
+    next_cursor = None if cursor.done else cursors.register(cursor)
+    return {"result": result, "columns": cursor.columns, "truncated": cursor.truncated, "next_cursor": next_cursor, "cost": cursor.budget.cost()}
+
+@router.get("/{task_id}/execute/page", response_model=ExecuteQueryResponseSchema)
+async def fetch_query_page(
+    task_id: UUID,
+    cursor: str,
+    page_size: int = Query(EXECUTE_PAGE_SIZE, ge=1, le=EXECUTE_MAX_PAGE_SIZE),
+    user = Depends(user_auth)
+):
+    with sql_errors():
+        result_cursor = cursors.get(cursor, task_id)
+    # later pages come from the buffer filled on the first request, the sandbox is not touched
+    result = result_cursor.fetch(page_size)
+
+    next_cursor = cursor
+    if result_cursor.done:
+        cursors.release(cursor)
+        next_cursor = None
+    return {"result": result, "columns": result_cursor.columns, "truncated": result_cursor.truncated, "next_cursor": next_cursor, "cost": result_cursor.budget.cost()}
 
 @router.get("/{task_id}/visualize", response_model=VisualizeDatabaseResponseSchema)
-async def visualize_database(task_id: UUID, user = Depends(user_auth)):
+async def visualize_database(task_id: UUID, user = Depends(user_auth), etag: ETag = Depends()):
     solution = await Solution.get_or_none(id=task_id)
     if not solution:
         raise HTTPException(status_code=404, detail="Solution not found")
 
-    temp_file_path = os.path.join(TEMP_DIR, f"{task_id}.sqlite")
-    if not os.path.exists(temp_file_path):
+    if not sandboxes.exists(task_id):
         raise HTTPException(status_code=404, detail="Temporary task file not found")
 
     if solution.status == Status.FINISH:
         raise HTTPException(status_code=403, detail="Solution is finished")
 
-    try:
-        with sqlite3.connect(temp_file_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
-
-            structure = {}
-            for table in tables:
-                table_name = table[0]
-                cursor.execute(f"PRAGMA table_info({table_name});")
-                columns = cursor.fetchall()
-                structure[table_name] = {
-                    "columns": [
-                        {"name": col[1], "type": col[2], "notnull": col[3], "default": col[4], "pk": col[5]} for col in columns
-                    ]
-                }
-
-                cursor.execute(f"SELECT * FROM {table_name} LIMIT 5;")
-                rows = cursor.fetchall()
-                structure[table_name]["sample_data"] = rows
-    except sqlite3.Error as e:
-        raise HTTPException(status_code=400, detail=f"SQL Error: {e}")
+    # the same version the schema cache keys on, read from the sandbox header without describing it
+    version = await run_in_threadpool(sandboxes.version, task_id)
+    if (not_modified := etag.check(version)) is not None:
+        return not_modified
+
+    with sql_errors():
+        structure = await executor.run(schema_cache.sandbox, task_id)
 
     return {"structure": structure}
 
@@ -200,18 +240,44 @@ async def solve_task(task_id: UUID, answer: str, user = Depends(user_auth)):
     if solution.status == Status.FINISH:
         raise HTTPException(status_code=403, detail="Solution is finished")
 
-    if solution.task.answer == answer:
-        solution.status = Status.FINISH
-        await solution.save()
-        result = await Results.create(
-            id=uuid4(),
-            task=solution.task,
-            user=user,
-            points_earned=solution.task.price
-        )
+    if solution.task.answer_mode == AnswerMode.RESULT:
+        if not sandboxes.exists(task_id):
+            raise HTTPException(status_code=404, detail="Temporary task file not found")
+        with sql_errors():
+            fingerprint = await executor.run(
+                fingerprint_solution,
+                task_id,
+                answer,
+                limits_for(solution.task.level),
+                solution.task.answer_ordered,
+                solution.task.answer_precision,
+                str(solution.task.id)
+            )
+        correct = fingerprint == solution.task.answer_fingerprint
+    else:
+        correct = solution.task.answer == answer
+
+    if correct:
+        async with in_transaction():
+            # the FINISH check above ran before grading, so parallel correct submissions all get here;
+            # only the one that moves the solution to FINISH earns the points
+            finished = await Solution.filter(id=task_id).exclude(status=Status.FINISH).update(status=Status.FINISH)
+            if not finished:
+                raise HTTPException(status_code=403, detail="Solution is finished")
+            solution.status = Status.FINISH
+            result = await Results.create(
+                id=uuid4(),
+                task=solution.task,
+                user=user,
+                points_earned=solution.task.price
+            )
+            await progress.record_completion(user, solution.task, solution.task.price)
 
-        user.points += solution.task.price
-        await user.save()
+            # the user may be a cached copy, writing it back could undo changes made since it was loaded
+            await User.filter(id=user.id).update(points=F("points") + solution.task.price, revision=uuid4().hex)
+        principal_cache.invalidate(user.username)
+        user = await User.get(id=user.id)
+        leaderboard.upsert(user)
 
         return SolveResponseSchema(
             message="You have entered the correct answer!",
@@ -1,22 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
-from src.security.middleware import JWTBearer
-from src.schemas.user import UserResponseSchema, UserUpdateSchema, UsersResponseSchema
-from src.schemas.tasks import Task, \
-                              ResultResponseSchema, \
-                              UserTaskStatistics, \
-                              UserProgressResponse
-from src.db import User, Results
-import os
-import shutil
-from collections import defaultdict
-from uuid import uuid4
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query
+from src.security.middleware import JWTBearer, principal_cache
+from src.schemas.user import UserResponseSchema, UserUpdateSchema, UsersResponseSchema, \
+                             UsersPageResponseSchema, RankedUserSchema, UserRankResponseSchema
+from src.schemas.tasks import UserProgressResponse
+from src.db import User, Level
+from src.services.leaderboard import leaderboard
+from src.services import progress
+from src.services.pagination import parse_fields, keyset_page
+from src.services.avatars import save_avatar, remove_avatar, InvalidImage
+from src.services.etag import ETag, process_token
+from src.config import LIST_PAGE_SIZE, LIST_MAX_PAGE_SIZE, AVATAR_MAX_BYTES
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
 
 router = APIRouter()
 user_auth = JWTBearer()
 
-AVATAR_DIR = "avatars"
-os.makedirs(AVATAR_DIR, exist_ok=True)
-
 @router.get("/me", response_model=UserResponseSchema)
 async def get_current_user(user = Depends(user_auth)):
     return UserResponseSchema(
@@ -29,7 +28,7 @@ async def get_current_user(user = Depends(user_auth)):
 
 
 @router.get("/progress/{username}", response_model=UserProgressResponse)
-async def get_user_progress(username):
+async def get_user_progress(username, etag: ETag = Depends()):
     user = await User.get_or_none(username=username)
     if not user:
         raise HTTPException(
@@ -37,77 +36,62 @@ async def get_user_progress(username):
             detail="User not found"
         )
 
-    completed_results = await Results.filter(
-        user=user,
-        points_earned__gt=0
-    ).prefetch_related('task')
-    
-    total_points = sum(result.points_earned for result in completed_results)
-    
-    tasks_by_level = defaultdict(int)
-    for result in completed_results:
-        tasks_by_level[result.task.level] += 1
-    
-    recent_results = await Results.filter(
-        user=user
-    ).limit(10).prefetch_related('task')
-
-    recent_results_schema = [
-        ResultResponseSchema(
-            id=result.id,
-            task=Task(
-                id=result.task.id,
-                name=result.task.name,
-                description=result.task.description,
-                level=result.task.level,
-                db_path=result.task.db_path,
-                price=result.task.price
-            ),
-            user=UserResponseSchema(
-                name=user.name,
-                username=user.username,
-                description=user.description,
-                avatar=user.avatar,
-                points=user.points
-            ),
-            points_earned=result.points_earned
-        )
-        for result in recent_results
-    ]
-
-    statistics = UserTaskStatistics(
-        total_tasks_completed=len(completed_results),
-        total_points_earned=total_points,
-        tasks_by_level=dict(tasks_by_level),
-        recent_results=recent_results_schema
-    )
+    # solving a task always saves the user, so the revision also covers the results
+    if (not_modified := etag.check(user.revision)) is not None:
+        return not_modified
 
-    return UserProgressResponse(statistics=statistics)
+    return await progress.get_user_progress(user)
 
-@router.get("/all", response_model=UsersResponseSchema)
-async def get_all_users():
-    return UsersResponseSchema(
-        users=[UserResponseSchema(
-                name=user.name,
-                username=user.username,
-                description=user.description,
-                avatar=user.avatar,
-                points=user.points
-    ) for user in await User.all()])
+USER_FIELDS = ("name", "username", "description", "avatar", "points")
+
+@router.get("/all", response_model=UsersPageResponseSchema, response_model_exclude_unset=True)
+async def get_all_users(
+    cursor: Optional[str] = None,
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE),
+    level: Optional[Level] = None,
+    fields: Optional[str] = None
+):
+    queryset = User.all()
+    if level is not None:
+        queryset = queryset.filter(level=level)
+    users, next_cursor = await keyset_page(
+        queryset,
+        key="username",
+        fields=parse_fields(fields, USER_FIELDS, key="username"),
+        cursor=cursor,
+        limit=limit
+    )
+    return {"users": users, "next_cursor": next_cursor}
 
 @router.get("/top", response_model=UsersResponseSchema)
-async def top_users():
+async def top_users(etag: ETag = Depends()):
+    # the leaderboard version counts changes in this worker only
+    if (not_modified := etag.check(process_token(), leaderboard.version)) is not None:
+        return not_modified
     return UsersResponseSchema(
-        users=[UserResponseSchema(
-                name=user.name,
-                username=user.username,
-                description=user.description,
-                avatar=user.avatar,
-                points=user.points
-    ) for user in await User.all().order_by("-points").limit(100)])
+        users=[UserResponseSchema(**profile) for profile in leaderboard.top(100)])
+
+@router.get("/rank/{username}", response_model=UserRankResponseSchema)
+async def get_user_rank(username: str, radius: int = Query(5, ge=0, le=50)):
+    profile = leaderboard.profile(username)
+    if profile is None:
+        raise HTTPException(
+            status_code=404,
+            detail="User not found"
+        )
+
+    return UserRankResponseSchema(
+        rank=leaderboard.rank(username),
+        total=len(leaderboard),
+        user=UserResponseSchema(**profile),
+        neighbors=[
+            RankedUserSchema(rank=rank, user=UserResponseSchema(**neighbor))
+            for rank, neighbor in leaderboard.around(username, radius)
+        ]
+    )
 
 @router.get("/{username}", response_model=UserResponseSchema)
-async def get_user_by_username(username: str):
+async def get_user_by_username(username: str, etag: ETag = Depends()):
     user = await User.get_or_none(username=username)
     if not user:
         raise HTTPException(
@@ -115,6 +99,9 @@ async def get_user_by_username(username: str):
             detail="User not found"
         )
 
+    if (not_modified := etag.check(user.revision)) is not None:
+        return not_modified
+
     return UserResponseSchema(
         name=user.name,
         username=user.username,
@@ -137,14 +124,25 @@ async def update_profile(
                 detail="Username already taken"
             )
     
+    # the dependency may hand out a cached copy, so the row is read again and only the changed fields are written
+    user = await User.get(id=user.id)
+    previous_username = user.username
+    changed = []
+
     if update_data.name is not None:
         user.name = update_data.name
+        changed.append("name")
     if update_data.username is not None:
         user.username = update_data.username
+        changed.append("username")
     if update_data.description is not None:
         user.description = update_data.description
+        changed.append("description")
     
-    await user.save()
+    await user.save(update_fields=changed)
+    # after the save, or a request in between would cache the old row again
+    principal_cache.invalidate(previous_username)
+    leaderboard.upsert(user, previous_username=previous_username)
     
     return UserResponseSchema(
         name=user.name,
@@ -164,25 +162,34 @@ async def upload_avatar(
             status_code=400,
             detail="File must be an image"
         )
-    
-    
-    file_ext = os.path.splitext(file.filename)[1]
-    avatar_name = f"{uuid4()}{file_ext}"
-    avatar_path = os.path.join(AVATAR_DIR, avatar_name)
-    
-    with open(avatar_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
+
+    data = await file.read(AVATAR_MAX_BYTES + 1)
+    if len(data) > AVATAR_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image is larger than {AVATAR_MAX_BYTES} bytes"
+        )
+
+    # decoding and resizing is CPU work, keep it off the event loop
+    try:
+        avatar_path = await run_in_threadpool(save_avatar, data)
+    except InvalidImage as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+
+    user = await User.get(id=user.id)
     old_avatar = user.avatar
     user.avatar = avatar_path
-    await user.save()
-    
-    if old_avatar and os.path.exists(old_avatar):
-        try:
-            os.remove(old_avatar)
-        except:
-            pass 
-    
+    await user.save(update_fields=["avatar"])
+    principal_cache.invalidate(user.username)
+    leaderboard.upsert(user)
+
+    # files are named by content, so another user may be showing the same picture
+    if old_avatar and old_avatar != avatar_path and not await User.filter(avatar=old_avatar).exists():
+        await run_in_threadpool(remove_avatar, old_avatar)
+
     return UserResponseSchema(
         name=user.name,
         username=user.username,
@@ -0,0 +1,63 @@
+from src.config import TEMP_DIR, TASKS_DIR, TEMPLATE_MAX_BYTES, SANDBOX_BACKEND, TEMPLATE_CACHE_BYTES, \
+                       SANDBOX_MEMORY_BYTES, SCHEMA_CACHE_SANDBOXES, \
+                       QUERY_WORKERS, QUERY_QUEUE_DEPTH, CURSOR_TTL_SECONDS, CURSOR_MAX_OPEN, CURSOR_BUFFER_BYTES, \
+                       REAPER_INTERVAL_SECONDS, SANDBOX_IDLE_TTL_SECONDS, SANDBOX_DISK_QUOTA_BYTES, \
+                       SANDBOX_POOL_MAX_PER_TASK, SANDBOX_POOL_LEAD_SECONDS, SANDBOX_POOL_HALF_LIFE_SECONDS, \
+                       SANDBOX_POOL_REFILL_SECONDS, SLOW_QUERY_MS, SLOW_QUERY_LOG_SIZE
+import os
+from src.services import metrics
+from .templates import TemplateCache, TemplateStore, InvalidTemplate, TemplateTooLarge
+from .backend import FileSandboxBackend, MemorySandboxBackend
+from .executor import QueryExecutor, ExecutorSaturated, QueryTimeout
+from .cursors import CursorRegistry, CursorExpired
+from .governor import BudgetExceeded, limits_for
+from .introspection import SchemaCache
+from .reaper import SandboxReaper
+from .pool import SandboxPool
+from .slowlog import SlowQueryLog
+
+templates = TemplateCache(max_bytes=TEMPLATE_CACHE_BYTES)
+template_store = TemplateStore(TASKS_DIR, max_bytes=TEMPLATE_MAX_BYTES)
+
+if SANDBOX_BACKEND == "memory":
+    sandboxes = MemorySandboxBackend(TEMP_DIR, templates, max_bytes=SANDBOX_MEMORY_BYTES)
+else:
+    sandboxes = FileSandboxBackend(TEMP_DIR)
+
+pool = SandboxPool(
+    sandboxes,
+    max_per_task=SANDBOX_POOL_MAX_PER_TASK,
+    lead=SANDBOX_POOL_LEAD_SECONDS,
+    half_life=SANDBOX_POOL_HALF_LIFE_SECONDS,
+    refill_interval=SANDBOX_POOL_REFILL_SECONDS
+)
+
+schema_cache = SchemaCache(sandboxes, max_sandboxes=SCHEMA_CACHE_SANDBOXES)
+
+executor = QueryExecutor(workers=QUERY_WORKERS, max_pending=QUERY_QUEUE_DEPTH)
+cursors = CursorRegistry(ttl=CURSOR_TTL_SECONDS, max_open=CURSOR_MAX_OPEN, max_bytes=CURSOR_BUFFER_BYTES)
+slow_queries = SlowQueryLog(threshold_ms=SLOW_QUERY_MS, max_entries=SLOW_QUERY_LOG_SIZE)
+
+reaper = SandboxReaper(
+    sandboxes,
+    schema_cache,
+    interval=REAPER_INTERVAL_SECONDS,
+    idle_ttl=SANDBOX_IDLE_TTL_SECONDS,
+    quota_bytes=SANDBOX_DISK_QUOTA_BYTES
+)
+
+
+@metrics.registry.collector
+def _collect_sandbox_metrics():
+    usage = {"disk": [0, 0], "memory": [0, 0], "pool": [0, 0]}
+    for info in sandboxes.list_sandboxes():
+        entry = usage["disk" if info.on_disk else "memory"]
+        entry[0] += 1
+        entry[1] += info.size
+    for directory, _, files in os.walk(pool.root):
+        for name in files:
+            usage["pool"][0] += 1
+            usage["pool"][1] += os.path.getsize(os.path.join(directory, name))
+    for location, (count, size) in usage.items():
+        metrics.sandboxes_total.set(location, value=count)
+        metrics.sandbox_bytes.set(location, value=size)
@@ -0,0 +1,300 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from uuid import uuid4
+from collections import OrderedDict
+from contextlib import contextmanager, closing
+from typing import Iterator, NamedTuple
+from .templates import TemplateCache
+
+
+# files SQLite and the memory spill keep next to <id>.sqlite, they belong to the sandbox and go with it
+SIDECARS = ("", "-wal", "-shm", "-journal", ".spill", ".spill-journal")
+
+
+class SandboxInfo(NamedTuple):
+    solution_id: str
+    size: int
+    last_used: float
+    on_disk: bool
+
+
+class FileSandboxBackend:
+    name = "file"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, solution_id) -> str:
+        return os.path.join(self.directory, f"{solution_id}.sqlite")
+
+    def provision(self, solution_id, template_key: str, template_path: str):
+        shutil.copy(template_path, self.path(solution_id))
+
+    def prepare(self, template_key: str, template_path: str, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        spare = os.path.join(directory, f"{uuid4()}.sqlite")
+        shutil.copy(template_path, spare)
+        return spare
+
+    def adopt(self, solution_id, spare: str):
+        # same filesystem, so claiming a spare is a single atomic rename
+        os.rename(spare, self.path(solution_id))
+
+    def release(self, spare: str):
+        try:
+            os.remove(spare)
+        except FileNotFoundError:
+            pass
+
+    def exists(self, solution_id) -> bool:
+        return os.path.exists(self.path(solution_id))
+
+    def over_budget(self) -> bool:
+        # spare files only cost disk, which the reaper's quota looks after
+        return False
+
+    @contextmanager
+    def connect(self, solution_id) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.path(solution_id), check_same_thread=False)) as conn:
+            yield conn
+
+    def version(self, solution_id) -> tuple:
+        # file change counter and schema cookie straight from the database header
+        path = self.path(solution_id)
+        with open(path, "rb") as f:
+            header = f.read(100)
+        # a sandbox copied from a WAL template published before they were normalized commits into the -wal file,
+        # and the header only moves on checkpoint
+        try:
+            wal = os.stat(f"{path}-wal")
+            wal_state = (wal.st_size, wal.st_mtime_ns)
+        except FileNotFoundError:
+            wal_state = None
+        return ("file", header[24:28], header[40:44], wal_state)
+
+    def handle(self, solution_id) -> "_FileHandle":
+        return _FileHandle(self.path(solution_id))
+
+    def list_sandboxes(self) -> list[SandboxInfo]:
+        sandboxes = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                solution_id, extension, sidecar = entry.name.partition(".sqlite")
+                if not extension or sidecar not in SIDECARS or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                size, last_used = sandboxes.get(solution_id, (0, 0.0))
+                sandboxes[solution_id] = (size + stat.st_size, max(last_used, stat.st_mtime))
+        return [SandboxInfo(solution_id, size, last_used, True) for solution_id, (size, last_used) in sandboxes.items()]
+
+    def discard(self, solution_id) -> int:
+        path = self.path(solution_id)
+        reclaimed = 0
+        for sidecar in SIDECARS:
+            try:
+                size = os.path.getsize(path + sidecar)
+                os.remove(path + sidecar)
+            except FileNotFoundError:
+                continue
+            reclaimed += size
+        return reclaimed
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class _FileHandle:
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+
+class _MemorySandbox:
+    def __init__(self, conn: sqlite3.Connection, size: int):
+        self.conn = conn
+        self.size = size
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+        # total_changes restarts with every connection, this keeps versions of different loads apart
+        self.generation = uuid4().hex
+
+    def close(self):
+        # the connection belongs to the backend, which closes it on discard or spill
+        pass
+
+
+class MemorySandboxBackend(FileSandboxBackend):
+    name = "memory"
+
+    def __init__(self, directory: str, templates: TemplateCache, max_bytes: int):
+        super().__init__(directory)
+        self.templates = templates
+        self.max_bytes = max_bytes
+        self._sandboxes: OrderedDict[str, _MemorySandbox] = OrderedDict()
+        self._resident = 0
+        # prepared but not yet adopted, i.e. spares sitting in the pool
+        self._reserved = 0
+        self._lock = threading.Lock()
+        self.spilled = 0
+
+    def provision(self, solution_id, template_key: str, template_path: str):
+        self.adopt(solution_id, self.prepare(template_key, template_path, self.directory))
+
+    def prepare(self, template_key: str, template_path: str, directory: str) -> _MemorySandbox:
+        image = self.templates.get(template_key, template_path)
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.deserialize(image)
+        with self._lock:
+            self._reserved += len(image)
+        return _MemorySandbox(conn, len(image))
+
+    def adopt(self, solution_id, spare: _MemorySandbox):
+        spare.last_used = time.time()
+        with self._lock:
+            self._sandboxes[str(solution_id)] = spare
+            self._reserved -= spare.size
+            self._resident += spare.size
+        self._spill()
+
+    def release(self, spare: _MemorySandbox):
+        with self._lock:
+            self._reserved -= spare.size
+        spare.conn.close()
+
+    def over_budget(self) -> bool:
+        with self._lock:
+            return self._resident + self._reserved > self.max_bytes
+
+    def exists(self, solution_id) -> bool:
+        with self._lock:
+            if str(solution_id) in self._sandboxes:
+                return True
+        return super().exists(solution_id)
+
+    @contextmanager
+    def connect(self, solution_id) -> Iterator[sqlite3.Connection]:
+        key = str(solution_id)
+        with self._lock:
+            sandbox = self._sandboxes.get(key)
+            if sandbox is not None:
+                self._sandboxes.move_to_end(key)
+                sandbox.last_used = time.time()
+
+        if sandbox is not None:
+            sandbox.lock.acquire()
+            if sandbox.conn is None:
+                # spilled to disk while we were waiting
+                sandbox.lock.release()
+                sandbox = None
+
+        if sandbox is None:
+            with super().connect(solution_id) as conn:
+                yield conn
+            return
+
+        try:
+            yield sandbox.conn
+            size = _database_size(sandbox.conn)
+        finally:
+            sandbox.lock.release()
+
+        with self._lock:
+            if self._sandboxes.get(key) is sandbox:
+                self._resident += size - sandbox.size
+                sandbox.size = size
+        self._spill()
+
+    def version(self, solution_id) -> tuple:
+        with self._lock:
+            sandbox = self._sandboxes.get(str(solution_id))
+        if sandbox is not None:
+            with sandbox.lock:
+                if sandbox.conn is not None:
+                    schema_version = sandbox.conn.execute("PRAGMA schema_version").fetchone()[0]
+                    return ("memory", sandbox.generation, sandbox.conn.total_changes, schema_version)
+        return super().version(solution_id)
+
+    def handle(self, solution_id):
+        with self._lock:
+            sandbox = self._sandboxes.get(str(solution_id))
+            if sandbox is not None:
+                sandbox.last_used = time.time()
+        if sandbox is None:
+            return super().handle(solution_id)
+        return sandbox
+
+    def list_sandboxes(self) -> list[SandboxInfo]:
+        with self._lock:
+            resident = [
+                SandboxInfo(solution_id, sandbox.size, sandbox.last_used, False)
+                for solution_id, sandbox in self._sandboxes.items()
+            ]
+        resident_ids = {info.solution_id for info in resident}
+        return resident + [info for info in super().list_sandboxes() if info.solution_id not in resident_ids]
+
+    def discard(self, solution_id) -> int:
+        reclaimed = 0
+        with self._lock:
+            sandbox = self._sandboxes.pop(str(solution_id), None)
+            if sandbox is not None:
+                self._resident -= sandbox.size
+        if sandbox is not None:
+            with sandbox.lock:
+                if sandbox.conn is not None:
+                    sandbox.conn.close()
+                    sandbox.conn = None
+                    reclaimed = sandbox.size
+        return reclaimed + super().discard(solution_id)
+
+    def _spill(self):
+        while True:
+            with self._lock:
+                # spares are memory as well, the pool releases them on its next refill when this runs over
+                if self._resident + self._reserved <= self.max_bytes or not self._sandboxes:
+                    return
+                key, sandbox = next(iter(self._sandboxes.items()))
+                if not sandbox.lock.acquire(blocking=False):
+                    # the least recently used sandbox is busy, try again after it finishes
+                    return
+
+            path = self.path(key)
+            try:
+                with closing(sqlite3.connect(f"{path}.spill")) as target:
+                    sandbox.conn.backup(target)
+                os.replace(f"{path}.spill", path)
+                sandbox.conn.close()
+                sandbox.conn = None
+            except BaseException:
+                sandbox.lock.release()
+                raise
+
+            with self._lock:
+                if self._sandboxes.get(key) is sandbox:
+                    del self._sandboxes[key]
+                    self._resident -= sandbox.size
+                self.spilled += 1
+            sandbox.lock.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            resident = {"sandboxes": len(self._sandboxes), "bytes": self._resident}
+            reserved = self._reserved
+        return {
+            "backend": self.name,
+            "resident": resident,
+            "reserved_bytes": reserved,
+            "spilled": self.spilled,
+            "templates": self.templates.stats(),
+        }
+
+
+def _database_size(conn: sqlite3.Connection) -> int:
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from src.services import metrics
+from .governor import QueryLimits, QueryBudget
+from .fingerprint import FETCH_BATCH
+
+logger = logging.getLogger(__name__)
+
+
+class CursorExpired(Exception):
+    pass
+
+
+class ResultCursor:
+    def __init__(self, solution_id, handle, query: str, limits: QueryLimits, task_id=None, slow_log=None):
+        self.solution_id = str(solution_id)
+        self.handle = handle
+        self.query = query
+        self.task_id = task_id
+        self.slow_log = slow_log
+        self.budget = QueryBudget(limits)
+        self.done = False
+        self.truncated = False
+        self._buffer = None
+        self._closed = False
+        self.cursor = None
+
+        # from here on the cursor owns the handle, a failed execute still closes it and is still logged
+        try:
+            with handle.lock:
+                if handle.conn is None:
+                    raise CursorExpired("Sandbox was unloaded, run the query again")
+                with self.budget.watch(handle.conn):
+                    self.cursor = handle.conn.cursor()
+                    self.cursor.execute(query)
+                if handle.conn.in_transaction:
+                    handle.conn.commit()
+        except BaseException as e:
+            self.close(e)
+            raise
+
+        self.columns = [column[0] for column in self.cursor.description or ()]
+        if not self.columns:
+            # INSERT, UPDATE or DDL: nothing will ever be fetched, so nothing else would close it
+            self.close()
+
+    @property
+    def fetched(self) -> int:
+        return self.budget.rows
+
+    def fetch(self, size: int) -> list:
+        if self.done:
+            return []
+        if self._buffer is not None:
+            rows = [self._buffer.popleft() for _ in range(min(size, len(self._buffer)))]
+            self.done = not self._buffer
+            return rows
+
+        size = min(size, self.budget.limits.max_rows - self.budget.rows)
+        try:
+            with self.handle.lock:
+                if self.handle.conn is None:
+                    raise CursorExpired("Sandbox was unloaded, run the query again")
+                with self.budget.watch(self.handle.conn):
+                    rows = self.cursor.fetchmany(size)
+                    kept = self.budget.take(rows)
+                    capped = len(kept) < len(rows) or self.budget.rows >= self.budget.limits.max_rows
+                    if capped:
+                        self.truncated = len(kept) < len(rows) or self.cursor.fetchone() is not None
+        except BaseException as e:
+            self.close(e)
+            raise
+
+        if len(rows) < size or capped:
+            self.close()
+        return kept
+
+    def detach(self):
+        # reads the rest of the result within the budget and finalizes the statement, so nothing holds
+        # a read transaction on the sandbox between two page requests and the learner's writes never wait on it
+        rows = []
+        while not self.done:
+            rows.extend(self.fetch(FETCH_BATCH))
+        self._buffer = deque(rows)
+        self.done = not self._buffer
+
+    def close(self, error: BaseException = None):
+        self.done = True
+        if self._buffer is not None:
+            self._buffer.clear()
+        if self._closed:
+            return
+        self._closed = True
+        metrics.learner_sql_duration.observe(self.budget.elapsed)
+        metrics.learner_sql_rows.observe(self.budget.rows)
+        if self.slow_log is not None:
+            self.slow_log.record(self.task_id, self.query, self.budget.cost(), error)
+        if self.cursor is not None:
+            with self.handle.lock:
+                try:
+                    self.cursor.close()
+                except sqlite3.ProgrammingError:
+                    pass
+        self.handle.close()
+
+
+class CursorRegistry:
+    def __init__(self, ttl: float, max_open: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_open = max_open
+        self.max_bytes = max_bytes
+        self.sweep_interval = max(1.0, ttl / 4)
+        self._cursors: OrderedDict[str, tuple[ResultCursor, float]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def register(self, cursor: ResultCursor) -> str:
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._cursors[token] = (cursor, time.monotonic() + self.ttl)
+            self._bytes += cursor.budget.bytes
+            expired = self._expired()
+        for stale in expired:
+            stale.close()
+        return token
+
+    def get(self, token: str, solution_id) -> ResultCursor:
+        with self._lock:
+            entry = self._cursors.get(token)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._cursors[token]
+                self._bytes -= entry[0].budget.bytes
+                entry[0].close()
+                entry = None
+            if entry is None or entry[0].solution_id != str(solution_id):
+                raise CursorExpired("Cursor not found or expired")
+            cursor = entry[0]
+            self._cursors[token] = (cursor, time.monotonic() + self.ttl)
+            self._cursors.move_to_end(token)
+        return cursor
+
+    def release(self, token: str):
+        with self._lock:
+            entry = self._cursors.pop(token, None)
+            if entry is not None:
+                self._bytes -= entry[0].budget.bytes
+        if entry is not None:
+            entry[0].close()
+
+    def sweep(self) -> int:
+        with self._lock:
+            expired = self._expired()
+        for stale in expired:
+            stale.close()
+        return len(expired)
+
+    async def run_forever(self):
+        # expiry must not depend on another page request coming along
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Cursor sweep failed")
+
+    def _expired(self) -> list:
+        now = time.monotonic()
+        expired = []
+        while self._cursors:
+            token, (cursor, expires) = next(iter(self._cursors.items()))
+            if expires > now and len(self._cursors) <= self.max_open and self._bytes <= self.max_bytes:
+                break
+            del self._cursors[token]
+            self._bytes -= cursor.budget.bytes
+            expired.append(cursor)
+        return expired
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open": len(self._cursors), "buffered_bytes": self._bytes}
+
+    def __len__(self) -> int:
+        return len(self._cursors)
@@ -0,0 +1,54 @@
+import hashlib
+from typing import Optional
+
+FETCH_BATCH = 500
+_MODULUS = 1 << 256
+
+
+def _normalize(value, precision: Optional[int]) -> bytes:
+    if value is None:
+        return b"n"
+    if isinstance(value, float):
+        if precision is not None:
+            value = round(value, precision)
+        if not value.is_integer():
+            return b"f" + repr(value).encode()
+        value = int(value)
+    if isinstance(value, int):
+        return b"i" + str(value).encode()
+    if isinstance(value, bytes):
+        return b"b" + value
+    return b"s" + str(value).encode()
+
+
+class ResultFingerprint:
+    def __init__(self, ordered: bool, precision: Optional[int] = None):
+        self.ordered = ordered
+        self.precision = precision
+        self.rows = 0
+        self._hash = hashlib.sha256()
+        # order-insensitive results are hashed as a multiset: the sum of the row digests
+        self._sum = 0
+
+    def update(self, rows):
+        for row in rows:
+            encoded = b"".join(len(part).to_bytes(4, "big") + part for part in
+                               (_normalize(value, self.precision) for value in row))
+            digest = hashlib.sha256(encoded).digest()
+            if self.ordered:
+                self._hash.update(digest)
+            else:
+                self._sum = (self._sum + int.from_bytes(digest, "big")) % _MODULUS
+            self.rows += 1
+
+    def hexdigest(self) -> str:
+        body = self._hash.hexdigest() if self.ordered else f"{self._sum:064x}"
+        mode = "ordered" if self.ordered else "unordered"
+        return hashlib.sha256(f"{mode}:{self.rows}:{body}".encode()).hexdigest()
+
+
+def fingerprint_cursor(cursor, ordered: bool, precision: Optional[int] = None) -> str:
+    fingerprint = ResultFingerprint(ordered, precision)
+    while rows := cursor.fetchmany(FETCH_BATCH):
+        fingerprint.update(rows)
+    return fingerprint.hexdigest()
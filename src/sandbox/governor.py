@@ -0,0 +1,125 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from src.config import QUERY_TIMEOUT_SECONDS, EXECUTE_MAX_ROWS
+from src.db.models.base import Level
+from .executor import QueryTimeout
+
+# How many VM instructions run between two progress handler calls
+PROGRESS_STEP = 1000
+
+BLOCKED_FUNCTIONS = {"randomblob", "zeroblob", "load_extension", "readfile", "writefile", "fts3_tokenizer"}
+ALLOWED_PRAGMAS = {"table_info", "table_xinfo", "index_list", "index_info", "index_xinfo", "foreign_key_list"}
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class QueryLimits:
+    instructions: int
+    max_rows: int
+    max_bytes: int
+    max_length: int
+    allow_recursive: bool
+
+
+LEVEL_LIMITS = {
+    Level.BEGINNER: QueryLimits(instructions=5_000_000, max_rows=1000, max_bytes=1 << 20, max_length=1 << 16, allow_recursive=False),
+    Level.INTERMEDIATE: QueryLimits(instructions=20_000_000, max_rows=2000, max_bytes=2 << 20, max_length=1 << 18, allow_recursive=False),
+    Level.ADVANCED: QueryLimits(instructions=50_000_000, max_rows=5000, max_bytes=4 << 20, max_length=1 << 20, allow_recursive=True),
+    Level.EXPERT: QueryLimits(instructions=100_000_000, max_rows=10000, max_bytes=8 << 20, max_length=1 << 20, allow_recursive=True),
+    Level.MASTER: QueryLimits(instructions=200_000_000, max_rows=10000, max_bytes=16 << 20, max_length=1 << 22, allow_recursive=True),
+}
+
+# e.g. QUERY_LIMITS='{"Beginner": {"instructions": 1000000}}'
+for _level, _overrides in json.loads(os.getenv("QUERY_LIMITS", "{}")).items():
+    LEVEL_LIMITS[Level(_level)] = replace(LEVEL_LIMITS[Level(_level)], **_overrides)
+
+
+def limits_for(level: Level) -> QueryLimits:
+    limits = LEVEL_LIMITS[level]
+    return replace(limits, max_rows=min(limits.max_rows, EXECUTE_MAX_ROWS))
+
+
+def _authorizer(limits: QueryLimits, rollback_only: bool):
+    def authorize(action, arg1, arg2, db_name, source):
+        if action in (sqlite3.SQLITE_ATTACH, sqlite3.SQLITE_DETACH):
+            return sqlite3.SQLITE_DENY
+        # the caller holds the query in a transaction it rolls back, a COMMIT or RELEASE would let it out
+        if rollback_only and action in (sqlite3.SQLITE_TRANSACTION, sqlite3.SQLITE_SAVEPOINT):
+            return sqlite3.SQLITE_DENY
+        if action == sqlite3.SQLITE_FUNCTION and arg2 and arg2.lower() in BLOCKED_FUNCTIONS:
+            return sqlite3.SQLITE_DENY
+        if action == sqlite3.SQLITE_RECURSIVE and not limits.allow_recursive:
+            return sqlite3.SQLITE_DENY
+        if action == sqlite3.SQLITE_PRAGMA and arg1.lower() not in ALLOWED_PRAGMAS:
+            return sqlite3.SQLITE_DENY
+        return sqlite3.SQLITE_OK
+    return authorize
+
+
+def row_size(row) -> int:
+    return sum(len(value) if isinstance(value, (str, bytes)) else 8 for value in row)
+
+
+class QueryBudget:
+    def __init__(self, limits: QueryLimits):
+        self.limits = limits
+        self.instructions = 0
+        self.rows = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+
+    @contextmanager
+    def watch(self, conn: sqlite3.Connection, rollback_only: bool = False):
+        expires = time.monotonic() + QUERY_TIMEOUT_SECONDS
+        reason = None
+
+        def check():
+            nonlocal reason
+            self.instructions += PROGRESS_STEP
+            if self.instructions > self.limits.instructions:
+                reason = "instructions"
+            elif time.monotonic() > expires:
+                reason = "timeout"
+            return reason is not None
+
+        conn.set_progress_handler(check, PROGRESS_STEP)
+        conn.set_authorizer(_authorizer(self.limits, rollback_only))
+        max_length = conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, self.limits.max_length)
+        started = time.perf_counter()
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if reason == "timeout":
+                raise QueryTimeout(f"Query exceeded {QUERY_TIMEOUT_SECONDS:g}s") from e
+            if reason == "instructions":
+                raise BudgetExceeded(f"Query exceeded the budget of {self.limits.instructions} instructions") from e
+            raise
+        finally:
+            self.elapsed += time.perf_counter() - started
+            conn.set_progress_handler(None, 0)
+            conn.set_authorizer(None)
+            conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, max_length)
+
+    def take(self, rows: list) -> list:
+        for index, row in enumerate(rows):
+            size = row_size(row)
+            if self.rows >= self.limits.max_rows or self.bytes + size > self.limits.max_bytes:
+                return rows[:index]
+            self.rows += 1
+            self.bytes += size
+        return rows
+
+    def cost(self) -> dict:
+        return {
+            "instructions": self.instructions,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "elapsed_ms": round(self.elapsed * 1000, 3),
+        }
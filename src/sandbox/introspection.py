@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing
+
+SAMPLE_ROWS = 5
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def describe(conn: sqlite3.Connection) -> dict:
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+    tables = cursor.fetchall()
+
+    structure = {}
+    for (table_name,) in tables:
+        table = _quote(table_name)
+        cursor.execute(f"PRAGMA table_info({table});")
+        columns = cursor.fetchall()
+        structure[table_name] = {
+            "columns": [
+                {"name": col[1], "type": col[2], "notnull": col[3], "default": col[4], "pk": col[5]} for col in columns
+            ]
+        }
+
+        cursor.execute(f"PRAGMA foreign_key_list({table});")
+        structure[table_name]["foreign_keys"] = [
+            {"id": fk[0], "seq": fk[1], "table": fk[2], "from": fk[3], "to": fk[4], "on_update": fk[5], "on_delete": fk[6]}
+            for fk in cursor.fetchall()
+        ]
+
+        cursor.execute(f"PRAGMA index_list({table});")
+        indexes = []
+        for index in cursor.fetchall():
+            index_columns = conn.execute(f"PRAGMA index_info({_quote(index[1])});").fetchall()
+            indexes.append({
+                "name": index[1],
+                "unique": bool(index[2]),
+                "origin": index[3],
+                "columns": [col[2] for col in index_columns],
+            })
+        structure[table_name]["indexes"] = indexes
+
+        cursor.execute(f"SELECT * FROM {table} LIMIT {SAMPLE_ROWS};")
+        structure[table_name]["sample_data"] = cursor.fetchall()
+    return structure
+
+
+def describe_template(path: str) -> dict:
+    with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+        return describe(conn)
+
+
+class SchemaCache:
+    def __init__(self, backend, max_sandboxes: int):
+        self.backend = backend
+        self.max_sandboxes = max_sandboxes
+        self._templates: dict[str, dict] = {}
+        self._sandboxes: OrderedDict[str, tuple[tuple, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def template(self, template_key: str, template_path: str) -> dict:
+        structure = self._templates.get(template_key)
+        if structure is None:
+            structure = describe_template(template_path)
+            self._templates[template_key] = structure
+        return structure
+
+    def bind(self, solution_id, template_key: str, template_path: str):
+        # a fresh sandbox shares the template's structure until its version moves
+        structure = self.template(template_key, template_path)
+        self._store(str(solution_id), self.backend.version(solution_id), structure)
+
+    def sandbox(self, solution_id) -> dict:
+        key = str(solution_id)
+        version = self.backend.version(solution_id)
+        with self._lock:
+            entry = self._sandboxes.get(key)
+            if entry is not None and entry[0] == version:
+                self._sandboxes.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        with self.backend.connect(solution_id) as conn:
+            structure = describe(conn)
+        self._store(key, version, structure)
+        return structure
+
+    def _store(self, key: str, version: tuple, structure: dict):
+        with self._lock:
+            self._sandboxes[key] = (version, structure)
+            self._sandboxes.move_to_end(key)
+            while len(self._sandboxes) > self.max_sandboxes:
+                self._sandboxes.popitem(last=False)
+
+    def forget(self, solution_id):
+        with self._lock:
+            self._sandboxes.pop(str(solution_id), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "templates": len(self._templates),
+                "sandboxes": len(self._sandboxes),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import math
+import os
+import shutil
+import sqlite3
+import time
+from collections import deque
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Spare files live under the sandbox directory so claiming one is a rename on the same filesystem
+POOL_DIR = ".pool"
+
+
+class _TaskPool:
+    def __init__(self, template_path: str):
+        self.template_path = template_path
+        self.spares = deque()
+        # exponentially decayed start rate, in starts per second
+        self.rate = 0.0
+        self.updated = time.monotonic()
+        self.short_since = None
+
+
+class SandboxPool:
+    def __init__(self, backend, max_per_task: int, lead: float, half_life: float, refill_interval: float):
+        self.backend = backend
+        # one directory per worker, so a restarting worker only clears its own spares
+        self.root = os.path.join(backend.directory, POOL_DIR)
+        self.directory = os.path.join(self.root, str(os.getpid()))
+        self.max_per_task = max_per_task
+        self.lead = lead
+        self.refill_interval = refill_interval
+        self._decay = math.log(2) / half_life
+        self._tasks: dict[str, _TaskPool] = {}
+        self._wake = asyncio.Event()
+        self.hits = 0
+        self.misses = 0
+        self.prepared = 0
+        self.refill_lag = {"last_ms": 0.0, "max_ms": 0.0, "total_ms": 0.0, "count": 0}
+
+    async def provision(self, solution_id, template_key: str, template_path: str):
+        pool = self._tasks.get(template_key)
+        if pool is None:
+            pool = self._tasks[template_key] = _TaskPool(template_path)
+        now = time.monotonic()
+        pool.rate = self._rate(pool, now) + self._decay
+        pool.updated = now
+
+        claimed = False
+        if pool.spares:
+            try:
+                await run_in_threadpool(self.backend.adopt, solution_id, pool.spares.popleft())
+                claimed = True
+            except OSError:
+                logger.exception("Could not claim a spare sandbox for task %s", template_key)
+        if claimed:
+            self.hits += 1
+        else:
+            self.misses += 1
+            await run_in_threadpool(self.backend.provision, solution_id, template_key, template_path)
+
+        if pool.short_since is None and len(pool.spares) < self._target(pool, now):
+            pool.short_since = now
+        self._wake.set()
+
+    async def run_forever(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.refill()
+            except Exception:
+                logger.exception("Sandbox pool refill failed")
+
+    async def refill(self):
+        for template_key, pool in list(self._tasks.items()):
+            target = self._target(pool, time.monotonic())
+            while len(pool.spares) > target:
+                await run_in_threadpool(self.backend.release, pool.spares.pop())
+
+            directory = os.path.join(self.directory, template_key)
+            try:
+                # in memory, spares share SANDBOX_MEMORY_BYTES with live sandboxes and only take what is left over
+                while len(pool.spares) < target and not self.backend.over_budget():
+                    spare = await run_in_threadpool(self.backend.prepare, template_key, pool.template_path, directory)
+                    pool.spares.append(spare)
+                    self.prepared += 1
+            except (OSError, sqlite3.Error):
+                # the template is gone or unreadable, stop pooling it
+                logger.exception("Could not prepare a spare sandbox for task %s", template_key)
+                await self._drop(template_key)
+                continue
+
+            if pool.short_since is not None:
+                self._record_lag(time.monotonic() - pool.short_since)
+                pool.short_since = None
+            if not pool.spares and self._rate(pool, time.monotonic()) < self._decay / 100:
+                # less than 1% of a single start is left in the rate, forget the task
+                self._tasks.pop(template_key, None)
+        await self._trim()
+
+    async def _trim(self):
+        # live sandboxes grew into the room the spares took, the least wanted spares go so the next adopt
+        # doesn't have to spill a learner's sandbox on their account
+        pools = sorted(self._tasks.values(), key=lambda pool: self._rate(pool, time.monotonic()))
+        for pool in pools:
+            while pool.spares and self.backend.over_budget():
+                await run_in_threadpool(self.backend.release, pool.spares.pop())
+
+    async def clear(self):
+        for template_key in list(self._tasks):
+            await self._drop(template_key)
+        await run_in_threadpool(self._remove_stale)
+
+    def _remove_stale(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            if name.isdigit() and not _alive(int(name)):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    async def _drop(self, template_key: str):
+        pool = self._tasks.pop(template_key, None)
+        while pool is not None and pool.spares:
+            await run_in_threadpool(self.backend.release, pool.spares.pop())
+
+    def _rate(self, pool: _TaskPool, now: float) -> float:
+        return pool.rate * math.exp(-self._decay * (now - pool.updated))
+
+    def _target(self, pool: _TaskPool, now: float) -> int:
+        return min(self.max_per_task, int(self._rate(pool, now) * self.lead + 0.5))
+
+    def _record_lag(self, lag: float):
+        lag_ms = lag * 1000
+        self.refill_lag["last_ms"] = round(lag_ms, 3)
+        self.refill_lag["max_ms"] = round(max(self.refill_lag["max_ms"], lag_ms), 3)
+        self.refill_lag["total_ms"] += lag_ms
+        self.refill_lag["count"] += 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        claims = self.hits + self.misses
+        lag = self.refill_lag
+        return {
+            "spares": sum(len(pool.spares) for pool in self._tasks.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / claims, 4) if claims else None,
+            "prepared": self.prepared,
+            "refill_lag_ms": {
+                "last": lag["last_ms"],
+                "max": lag["max_ms"],
+                "avg": round(lag["total_ms"] / lag["count"], 3) if lag["count"] else None,
+            },
+            "tasks": {
+                template_key: {
+                    "spares": len(pool.spares),
+                    "target": self._target(pool, now),
+                    "starts_per_minute": round(self._rate(pool, now) * 60, 3),
+                }
+                for template_key, pool in self._tasks.items()
+            },
+        }
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
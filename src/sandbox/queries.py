@@ -0,0 +1,126 @@
+import sqlite3
+import orjson
+from contextlib import closing
+from typing import Optional
+from . import sandboxes, executor, slow_queries
+from .cursors import ResultCursor, CursorExpired
+from .executor import ExecutorSaturated, QueryTimeout
+from .governor import QueryLimits, QueryBudget, BudgetExceeded
+from .fingerprint import fingerprint_cursor, FETCH_BATCH
+
+
+def open_cursor(solution_id, query: str, limits: QueryLimits, task_id=None) -> ResultCursor:
+    # the cursor closes the handle itself if the query fails
+    return ResultCursor(solution_id, sandboxes.handle(solution_id), query, limits, task_id, slow_queries)
+
+
+def run_query(solution_id, query: str, limits: QueryLimits, task_id=None) -> tuple[ResultCursor, list]:
+    cursor = open_cursor(solution_id, query, limits, task_id)
+    return cursor, cursor.fetch(limits.max_rows)
+
+
+def page_query(solution_id, query: str, limits: QueryLimits, page_size: int, task_id=None) -> tuple[ResultCursor, list]:
+    cursor = open_cursor(solution_id, query, limits, task_id)
+    try:
+        rows = cursor.fetch(page_size)
+        # the rest is buffered, the statement must not outlive this request
+        cursor.detach()
+    except BaseException:
+        cursor.close()
+        raise
+    return cursor, rows
+
+
+def explain_query(solution_id, query: str, limits: QueryLimits, task_id=None) -> tuple[list, list, dict]:
+    handle = sandboxes.handle(solution_id)
+    budget = QueryBudget(limits)
+    error = None
+    try:
+        with handle.lock:
+            if handle.conn is None:
+                raise CursorExpired("Sandbox was unloaded, try again")
+            # an explicit transaction, so even DDL in the timed run is rolled back
+            if not handle.conn.in_transaction:
+                handle.conn.execute("BEGIN")
+            try:
+                with QueryBudget(limits).watch(handle.conn, rollback_only=True):
+                    plan = [
+                        {"id": row[0], "parent": row[1], "detail": row[3]}
+                        for row in handle.conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+                    ]
+                # the timed run reads the whole result, up to the row caps, and then throws it away
+                with budget.watch(handle.conn, rollback_only=True):
+                    cursor = handle.conn.execute(query)
+                    while rows := cursor.fetchmany(FETCH_BATCH):
+                        if len(budget.take(rows)) < len(rows):
+                            break
+                columns = [column[0] for column in cursor.description or ()]
+            finally:
+                # explaining a query must never change the learner's sandbox
+                if handle.conn.in_transaction:
+                    handle.conn.rollback()
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        handle.close()
+        slow_queries.record(task_id, query, budget.cost(), error)
+    return plan, columns, budget.cost()
+
+
+def fingerprint_template(path: str, query: str, limits: QueryLimits, ordered: bool, precision: Optional[int]) -> str:
+    with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+        with QueryBudget(limits).watch(conn):
+            return fingerprint_cursor(conn.execute(query), ordered, precision)
+
+
+def fingerprint_solution(solution_id, query: str, limits: QueryLimits, ordered: bool, precision: Optional[int],
+                         task_id=None) -> str:
+    handle = sandboxes.handle(solution_id)
+    budget = QueryBudget(limits)
+    error = None
+    try:
+        with handle.lock:
+            if handle.conn is None:
+                raise CursorExpired("Sandbox was unloaded, try again")
+            # sqlite3 autocommits DDL, an explicit transaction is the only way a DROP in an answer gets undone
+            if not handle.conn.in_transaction:
+                handle.conn.execute("BEGIN")
+            try:
+                with budget.watch(handle.conn, rollback_only=True):
+                    return fingerprint_cursor(handle.conn.execute(query), ordered, precision)
+            finally:
+                # checking an answer must never change the learner's sandbox
+                if handle.conn.in_transaction:
+                    handle.conn.rollback()
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        handle.close()
+        slow_queries.record(task_id, query, budget.cost(), error)
+
+
+async def stream_rows(cursor: ResultCursor, page_size: int):
+    try:
+        yield encode_row({"columns": cursor.columns})
+        while not cursor.done:
+            rows = await executor.run(cursor.fetch, page_size)
+            if rows:
+                yield b"".join(encode_row(row) for row in rows)
+        yield encode_row({"rows": cursor.fetched, "truncated": cursor.truncated, "cost": cursor.budget.cost()})
+    except (ExecutorSaturated, QueryTimeout, BudgetExceeded, CursorExpired, sqlite3.Error) as e:
+        yield encode_row({"error": str(e)})
+    finally:
+        cursor.close()
+
+
+def encode_row(row) -> bytes:
+    # one NDJSON line
+    return orjson.dumps(row, default=_json_default, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def _json_default(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError(f"Unsupported type {type(value).__name__}")
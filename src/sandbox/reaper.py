@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from uuid import UUID
+from starlette.concurrency import run_in_threadpool
+from src.db import Solution, Status, shared_state
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_BATCH = 500
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+class SandboxReaper:
+    def __init__(self, backend, schema_cache, interval: float, idle_ttl: float, quota_bytes: int):
+        self.backend = backend
+        self.schema_cache = schema_cache
+        self.interval = interval
+        self.idle_ttl = idle_ttl
+        self.quota_bytes = quota_bytes
+        self.runs = 0
+        self.evicted = {"finished": 0, "orphaned": 0, "idle": 0, "quota": 0}
+        self.bytes_reclaimed = 0
+        self.disk_bytes = 0
+        self.last_run_at = None
+
+    async def run_forever(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # with several workers only the lease holder sweeps
+                if await shared_state.lease("sandbox-reaper", self.interval * 3):
+                    await self.sweep()
+            except Exception:
+                logger.exception("Sandbox sweep failed")
+
+    async def sweep(self):
+        sandboxes = [info for info in await run_in_threadpool(self.backend.list_sandboxes) if _is_uuid(info.solution_id)]
+        solutions = await self._solutions([info.solution_id for info in sandboxes])
+
+        now = time.time()
+        survivors = []
+        for info in sandboxes:
+            solution = solutions.get(info.solution_id)
+            if solution is None:
+                await self._evict(info.solution_id, "orphaned")
+            elif solution["status"] == Status.FINISH:
+                await self._evict(info.solution_id, "finished")
+            else:
+                last_activity = solution["last_activity_at"]
+                last_used = max(info.last_used, last_activity.timestamp() if last_activity else 0)
+                if now - last_used > self.idle_ttl:
+                    await self._evict(info.solution_id, "idle")
+                else:
+                    survivors.append((last_used, info))
+
+        on_disk = sorted((entry for entry in survivors if entry[1].on_disk), key=lambda entry: entry[0])
+        disk_bytes = sum(info.size for _, info in on_disk)
+        for _, info in on_disk:
+            if disk_bytes <= self.quota_bytes:
+                break
+            await self._evict(info.solution_id, "quota")
+            disk_bytes -= info.size
+
+        self.disk_bytes = disk_bytes
+        self.runs += 1
+        self.last_run_at = now
+
+    async def _solutions(self, solution_ids: list[str]) -> dict[str, dict]:
+        solutions = {}
+        for start in range(0, len(solution_ids), LOOKUP_BATCH):
+            rows = await Solution.filter(
+                id__in=solution_ids[start:start + LOOKUP_BATCH]
+            ).values("id", "status", "last_activity_at")
+            solutions.update({str(row["id"]): row for row in rows})
+        return solutions
+
+    async def _evict(self, solution_id: str, reason: str):
+        self.bytes_reclaimed += await run_in_threadpool(self.backend.discard, solution_id)
+        self.schema_cache.forget(solution_id)
+        self.evicted[reason] += 1
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "last_run_at": self.last_run_at,
+            "evicted": dict(self.evicted),
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "disk_bytes": self.disk_bytes,
+            "quota_bytes": self.quota_bytes,
+        }
@@ -0,0 +1,95 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from .executor import QueryTimeout
+from .governor import BudgetExceeded
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+# Raw queries are kept as an example only, trimmed to this many characters
+EXAMPLE_LENGTH = 2000
+
+
+def normalize_sql(query: str) -> str:
+    # literals become ?, so the same query shape with different values lands in one entry
+    query = _COMMENTS.sub(" ", query)
+    query = _STRINGS.sub("?", query)
+    query = _NUMBERS.sub("?", query)
+    query = _LISTS.sub("(?, ...)", query)
+    return _SPACES.sub(" ", query).strip().rstrip(";").strip()
+
+
+def failure_of(error: Optional[BaseException]) -> Optional[str]:
+    if isinstance(error, QueryTimeout):
+        return "timeout"
+    if isinstance(error, BudgetExceeded):
+        return "budget"
+    return None
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float, max_entries: int):
+        self.threshold_ms = threshold_ms
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def record(self, task_id: Optional[str], query: str, cost: dict, error: Optional[BaseException] = None):
+        # a query cut off by the deadline or the budget is the slowest kind there is, whatever it got to run
+        failure = failure_of(error)
+        if failure is None and cost["elapsed_ms"] < self.threshold_ms:
+            return
+        key = (str(task_id), normalize_sql(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {
+                    "task_id": key[0],
+                    "query": key[1],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "max_instructions": 0,
+                    "max_rows": 0,
+                    "timeouts": 0,
+                    "budget_exceeded": 0,
+                    "last_failure": None,
+                }
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + cost["elapsed_ms"], 3)
+            entry["max_ms"] = max(entry["max_ms"], cost["elapsed_ms"])
+            entry["max_instructions"] = max(entry["max_instructions"], cost["instructions"])
+            entry["max_rows"] = max(entry["max_rows"], cost["rows"])
+            if failure == "timeout":
+                entry["timeouts"] += 1
+            elif failure == "budget":
+                entry["budget_exceeded"] += 1
+            if failure is not None:
+                entry["last_failure"] = failure
+            entry["example"] = query[:EXAMPLE_LENGTH]
+            entry["last_seen"] = time.time()
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.recorded += 1
+
+    def entries(self, task_id: Optional[str] = None, limit: Optional[int] = None) -> list[dict]:
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values() if task_id is None or entry["task_id"] == task_id]
+        entries.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return entries[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"threshold_ms": self.threshold_ms, "entries": len(self._entries), "recorded": self.recorded}
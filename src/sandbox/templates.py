@@ -0,0 +1,172 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from uuid import uuid4
+from starlette.concurrency import run_in_threadpool
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+UPLOAD_CHUNK = 1024 * 1024
+
+
+class InvalidTemplate(Exception):
+    pass
+
+
+class TemplateTooLarge(InvalidTemplate):
+    pass
+
+
+def load_image(path: str) -> bytes:
+    with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+        return conn.serialize()
+
+
+class TemplateCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._images: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, path: str) -> bytes:
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+
+        image = load_image(path)
+
+        with self._lock:
+            if key not in self._images:
+                self._images[key] = image
+                self._size += len(image)
+            while self._size > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._size -= len(evicted)
+        return image
+
+    def invalidate(self, key: str):
+        with self._lock:
+            image = self._images.pop(key, None)
+            if image is not None:
+                self._size -= len(image)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "templates": len(self._images),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def _validate(path: str):
+    with open(path, "rb") as f:
+        if f.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+            raise InvalidTemplate("Not an SQLite database")
+    try:
+        with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+            problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    except sqlite3.Error as e:
+        raise InvalidTemplate(f"Unreadable SQLite database: {e}") from e
+    if problems != ["ok"]:
+        raise InvalidTemplate(f"Integrity check failed: {'; '.join(problems[:5])}")
+
+
+def _normalize(path: str):
+    # sandboxes are plain copies of the template, and in WAL mode their commits would sit in a -wal file
+    # that the header change counter behind FileSandboxBackend.version never sees
+    with open(path, "rb") as f:
+        header = f.read(20)
+    if header[18:20] == b"\x01\x01":
+        return
+    try:
+        with closing(sqlite3.connect(path)) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+    except sqlite3.Error as e:
+        raise InvalidTemplate(f"Could not switch the database out of WAL mode: {e}") from e
+
+
+class TemplateStore:
+    # templates are immutable and named by their sha256, so identical uploads share one file
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, template_hash: str) -> str:
+        return os.path.join(self.directory, f"{template_hash}.sqlite")
+
+    async def save(self, upload) -> tuple[str, str]:
+        partial = self._partial()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(partial, "wb") as out:
+                while chunk := await upload.read(UPLOAD_CHUNK):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise TemplateTooLarge(f"Task database is larger than {self.max_bytes} bytes")
+                    await run_in_threadpool(_write_chunk, out, digest, chunk)
+        except BaseException:
+            self.discard(partial)
+            raise
+        template_hash = digest.hexdigest()
+        return template_hash, await run_in_threadpool(self.publish, partial, template_hash)
+
+    def receive(self, source) -> tuple[str, str]:
+        # the blocking twin of save for file objects such as archive members, publish comes separately
+        partial = self._partial()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(partial, "wb") as out:
+                while chunk := source.read(UPLOAD_CHUNK):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise TemplateTooLarge(f"Task database is larger than {self.max_bytes} bytes")
+                    _write_chunk(out, digest, chunk)
+        except BaseException:
+            self.discard(partial)
+            raise
+        return partial, digest.hexdigest()
+
+    def publish(self, partial: str, template_hash: str) -> str:
+        path = self.path(template_hash)
+        try:
+            _validate(partial)
+            if not os.path.exists(path):
+                # the file keeps the name of the uploaded bytes, only the journal mode in its header differs
+                _normalize(partial)
+                os.replace(partial, path)
+        finally:
+            self.discard(partial)
+        return path
+
+    def discard(self, partial: str):
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    def _partial(self) -> str:
+        return os.path.join(self.directory, f".upload-{uuid4()}")
+
+
+def _write_chunk(out, digest, chunk: bytes):
+    digest.update(chunk)
+    out.write(chunk)
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
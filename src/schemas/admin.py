@@ -1,3 +1,24 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, Any, List
 
+class StatsResponseSchema(BaseModel):
+    stats: Dict[str, Any]
+
+class SlowQuerySchema(BaseModel):
+    task_id: str
+    query: str
+    example: str
+    count: int
+    total_ms: float
+    max_ms: float
+    max_instructions: int
+    max_rows: int
+    timeouts: int = 0
+    budget_exceeded: int = 0
+    last_failure: Optional[str] = None
+    last_seen: float
+
+class SlowQueriesResponseSchema(BaseModel):
+    threshold_ms: float
+    worker: int
+    queries: List[SlowQuerySchema]
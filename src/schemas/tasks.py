@@ -1,8 +1,9 @@
 from uuid import UUID
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
-from src.db import Level, Status
+from enum import Enum
+from src.db import Level, Status, AnswerMode
 from .user import UserResponseSchema
 
 class UploadTaskSchema(BaseModel):
@@ -11,11 +12,32 @@ class UploadTaskSchema(BaseModel):
     level: Level
     answer: str
     price: int
+    answer_mode: AnswerMode = AnswerMode.TEXT
+    answer_ordered: bool = False
+    answer_precision: Optional[int] = None
 
 class UploadTaskResponseSchema(BaseModel):
     task_id: str
     message: str
 
+class ImportTaskSchema(UploadTaskSchema):
+    file: str
+
+class ImportedTaskSchema(BaseModel):
+    index: int
+    file: str
+    task_id: str
+    name: str
+
+class ImportFailureSchema(BaseModel):
+    index: int
+    file: Optional[str] = None
+    error: str
+
+class ImportTasksResponseSchema(BaseModel):
+    imported: List[ImportedTaskSchema]
+    failed: List[ImportFailureSchema]
+
 class Task(BaseModel):
     id: UUID
     name: str
@@ -24,8 +46,30 @@ class Task(BaseModel):
     db_path: str
     price: int
 
+class ResultMode(Enum):
+    ALL = "all"
+    PAGE = "page"
+    STREAM = "stream"
+    EXPLAIN = "explain"
+
+class QueryCostSchema(BaseModel):
+    instructions: int
+    rows: int
+    bytes: int
+    elapsed_ms: float
+
+class QueryPlanStepSchema(BaseModel):
+    id: int
+    parent: int
+    detail: str
+
 class ExecuteQueryResponseSchema(BaseModel):
     result: List[Any]
+    columns: List[str] = []
+    truncated: bool = False
+    next_cursor: Optional[str] = None
+    cost: Optional[QueryCostSchema] = None
+    plan: Optional[List[QueryPlanStepSchema]] = None
 
 class VisualizeDatabaseResponseSchema(BaseModel):
     structure: Dict[str, Dict[str, Any]]
@@ -33,14 +77,30 @@ class VisualizeDatabaseResponseSchema(BaseModel):
 class GetTaskResponseSchema(BaseModel):
     temp_file_path: str
 
+class TaskProjection(BaseModel):
+    id: Optional[UUID] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    level: Optional[Level] = None
+    db_path: Optional[str] = None
+    price: Optional[int] = None
+
 class AllTasksResponseSchema(BaseModel):
-    result: List[Task]
+    result: List[TaskProjection]
+    next_cursor: Optional[str] = None
 
 class SolutionResponseSchema(BaseModel):
     id: UUID
     task: Task
     status: Status
 
+class ActiveSolutionSchema(SolutionResponseSchema):
+    created_at: Optional[datetime] = None
+    last_activity_at: Optional[datetime] = None
+
+class ActiveSolutionsResponseSchema(BaseModel):
+    solutions: List[ActiveSolutionSchema]
+
 class ResultResponseSchema(BaseModel):
     id: UUID
     task: Task
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 from typing import Optional
+from src.services.avatars import avatar_variants
 
 class UserResponseSchema(BaseModel):
     name: str
@@ -8,9 +9,36 @@ class UserResponseSchema(BaseModel):
     avatar: str
     points: int
 
+    # size -> url path of the resized copy, pick the smallest one that fits
+    @computed_field
+    @property
+    def avatars(self) -> dict[int, str]:
+        return avatar_variants(self.avatar)
+
 class UsersResponseSchema(BaseModel):
     users: list[UserResponseSchema]
 
+class UserProjection(BaseModel):
+    name: Optional[str] = None
+    username: Optional[str] = None
+    description: Optional[str] = None
+    avatar: Optional[str] = None
+    points: Optional[int] = None
+
+class UsersPageResponseSchema(BaseModel):
+    users: list[UserProjection]
+    next_cursor: Optional[str] = None
+
+class RankedUserSchema(BaseModel):
+    rank: int
+    user: UserResponseSchema
+
+class UserRankResponseSchema(BaseModel):
+    rank: int
+    total: int
+    user: UserResponseSchema
+    neighbors: list[RankedUserSchema]
+
 class UserUpdateSchema(BaseModel):
     name: Optional[str] = None
     username: Optional[str] = None
@@ -1,9 +1,56 @@
 import sqlite3
 import os
+import json
+import zipfile
 
 DB_DIR = "test_databases"
+ARCHIVE_PATH = os.path.join(DB_DIR, "tasks.zip")
 os.makedirs(DB_DIR, exist_ok=True)
 
+# Import everything in one call: python runner.py import-tasks test_databases/tasks.zip
+MANIFEST = [
+    {"file": "library.sqlite", "name": "Classic books", "level": "Beginner", "price": 10,
+     "description": "List the titles of books published before 1950.",
+     "answer": "SELECT title FROM books WHERE year < 1950"},
+    {"file": "school.sqlite", "name": "Top students", "level": "Beginner", "price": 10,
+     "description": "Find the names of students with a grade of 90 or higher.",
+     "answer": "SELECT name FROM students WHERE grade >= 90"},
+    {"file": "petshop.sqlite", "name": "Pets by species", "level": "Intermediate", "price": 20,
+     "description": "Count the pets of each species.",
+     "answer": "SELECT species, COUNT(*) FROM pets GROUP BY species"},
+    {"file": "movies.sqlite", "name": "Best movie", "level": "Beginner", "price": 10,
+     "description": "Find the title of the movie with the highest rating.",
+     "answer": "SELECT title FROM movies ORDER BY rating DESC LIMIT 1"},
+    {"file": "restaurant.sqlite", "name": "Menu prices", "level": "Intermediate", "price": 20,
+     "description": "Show the average price of menu items in each category.",
+     "answer": "SELECT category, AVG(price) FROM menu GROUP BY category", "answer_precision": 2},
+    {"file": "employees.sqlite", "name": "Payroll", "level": "Intermediate", "price": 20,
+     "description": "Show the total salary paid in each department.",
+     "answer": "SELECT department, SUM(salary) FROM employees GROUP BY department"},
+    {"file": "inventory.sqlite", "name": "Stock value", "level": "Advanced", "price": 30,
+     "description": "Find the total stock value, quantity times price, of each category, most valuable first.",
+     "answer": "SELECT category, SUM(quantity * price) AS value FROM products GROUP BY category ORDER BY value DESC",
+     "answer_ordered": True, "answer_precision": 2},
+    {"file": "cars.sqlite", "name": "Newest cars", "level": "Beginner", "price": 10,
+     "description": "List the brand and model of every car, newest first.",
+     "answer": "SELECT brand, model FROM cars ORDER BY year DESC, id", "answer_ordered": True},
+    {"file": "music.sqlite", "name": "Longest songs", "level": "Intermediate", "price": 20,
+     "description": "Find the longest song of each genre.",
+     "answer": "SELECT genre, title FROM songs s WHERE duration = (SELECT MAX(duration) FROM songs WHERE genre = s.genre)"},
+    {"file": "sports.sqlite", "name": "Winning teams", "level": "Beginner", "price": 10,
+     "description": "List the names of teams with more wins than losses.",
+     "answer": "SELECT name FROM teams WHERE wins > losses"},
+]
+
+def write_archive():
+    with zipfile.ZipFile(ARCHIVE_PATH, "w", zipfile.ZIP_DEFLATED) as archive:
+        # the answers are reference queries, checked by comparing results
+        tasks = [{"answer_mode": "result", **entry} for entry in MANIFEST]
+        archive.writestr("manifest.json", json.dumps({"tasks": tasks}, indent=2, ensure_ascii=False))
+        for entry in MANIFEST:
+            archive.write(os.path.join(DB_DIR, entry["file"]), entry["file"])
+    return ARCHIVE_PATH
+
 async def create_test_databases():
     # 1. Simple Library Database
     db_path = os.path.join(DB_DIR, "library.sqlite")
@@ -193,3 +240,5 @@ async def create_test_databases():
     c.executemany('INSERT INTO teams VALUES (?,?,?,?,?)', teams)
     conn.commit()
     conn.close()
+
+    write_archive()
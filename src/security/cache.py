@@ -0,0 +1,84 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+from src.db.models.user import User
+
+
+class PrincipalCache:
+    def __init__(self, max_size: int, ttl: float, state=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.state = state
+        if state is not None:
+            # other workers announce profile changes, drop our copy of the user
+            state.subscribe("principal", self.forget)
+        self._tokens: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._users: OrderedDict[str, tuple[User, float]] = OrderedDict()
+        self.token_hits = 0
+        self.token_misses = 0
+        self.user_hits = 0
+        self.user_misses = 0
+
+    def username(self, token: str) -> Optional[str]:
+        entry = self._get(self._tokens, token)
+        if entry is None:
+            self.token_misses += 1
+            return None
+        self.token_hits += 1
+        return entry
+
+    def remember_token(self, token: str, username: str, expires_at: Optional[float] = None):
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        self._put(self._tokens, token, username, deadline)
+
+    def user(self, username: str) -> Optional[User]:
+        entry = self._get(self._users, username)
+        if entry is None:
+            self.user_misses += 1
+            return None
+        self.user_hits += 1
+        return entry
+
+    def remember_user(self, user: User):
+        self._put(self._users, user.username, user, time.time() + self.ttl)
+
+    def invalidate(self, username: str):
+        self.forget(username)
+        if self.state is not None:
+            self.state.publish("principal", username)
+
+    def forget(self, username: str):
+        self._users.pop(username, None)
+
+    def _get(self, entries: OrderedDict, key: str):
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        value, deadline = entry
+        if deadline <= time.time():
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return value
+
+    def _put(self, entries: OrderedDict, key: str, value, deadline: float):
+        entries[key] = (value, deadline)
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        tokens = self.token_hits + self.token_misses
+        users = self.user_hits + self.user_misses
+        return {
+            "tokens": len(self._tokens),
+            "users": len(self._users),
+            "token_hits": self.token_hits,
+            "token_misses": self.token_misses,
+            "token_hit_rate": self.token_hits / tokens if tokens else 0.0,
+            "user_hits": self.user_hits,
+            "user_misses": self.user_misses,
+            "user_hit_rate": self.user_hits / users if users else 0.0,
+        }
@@ -1,6 +1,5 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
 from fastapi import HTTPException, status
 from pydantic import BaseModel
 
@@ -14,6 +13,7 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    expires_at: Optional[float] = None
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -22,15 +22,19 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(days=31*ACCESS_TOKEN_EXPIRE_MONTHS)
     to_encode.update({"exp": expire})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str, credentials_exception: HTTPException) -> TokenData:
+    # jose pulls in its crypto backends on import, so it is loaded on the first token instead of at startup
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-        return TokenData(username=username)
+        return TokenData(username=username, expires_at=payload.get("exp"))
     except JWTError:
         raise credentials_exception
\ No newline at end of file
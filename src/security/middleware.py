@@ -2,7 +2,12 @@ from typing import Optional
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from .jwt import verify_token
+from .cache import PrincipalCache
+from src.db import shared_state
 from src.db.models.user import User
+from src.config import AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS
+
+principal_cache = PrincipalCache(max_size=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS, state=shared_state)
 
 class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True, admin_required: bool = False):
@@ -25,17 +30,24 @@ class JWTBearer(HTTPBearer):
             )
 
         try:
-            token_data = verify_token(credentials.credentials, HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token or expired token"
-            ))
-            
-            user = await User.get_or_none(username=token_data.username)
-            if not user:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="User not found"
-                )
+            username = principal_cache.username(credentials.credentials)
+            if username is None:
+                token_data = verify_token(credentials.credentials, HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid token or expired token"
+                ))
+                username = token_data.username
+                principal_cache.remember_token(credentials.credentials, username, token_data.expires_at)
+
+            user = principal_cache.user(username)
+            if user is None:
+                user = await User.get_or_none(username=username)
+                if not user:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="User not found"
+                    )
+                principal_cache.remember_user(user)
 
             if self.admin_required and not user.is_admin:
                 raise HTTPException(
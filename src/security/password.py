@@ -1,9 +1,123 @@
-from passlib.context import CryptContext
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional
+from src.config import BCRYPT_ROUNDS, PASSWORD_WORKERS, PASSWORD_QUEUE_DEPTH
+from src.services import metrics
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def pwd_context():
+    # passlib is slow to import and only the hasher processes need it
+    from passlib.context import CryptContext
+
+    # min/max pin the cost factor, so hashes made with another one are reported as needing an update
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=BCRYPT_ROUNDS,
+        bcrypt__min_rounds=BCRYPT_ROUNDS,
+        bcrypt__max_rounds=BCRYPT_ROUNDS,
+    )
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    return pwd_context().verify_and_update(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context().hash(password)
+
+
+class HasherBusy(Exception):
+    pass
+
+
+class LatencyStats:
+    def __init__(self, window: int = 1024):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def stats(self) -> dict:
+        samples = sorted(self._samples)
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 3) if samples else 0.0
+
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.latency = {"hash": LatencyStats(), "verify": LatencyStats(), "login": LatencyStats()}
+
+    async def verify(self, plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+        return await self._submit("verify", verify_and_update_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", get_password_hash, password)
+
+    async def _submit(self, operation: str, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HasherBusy("Too many sign-ins in progress, try again later")
+            self._pending += 1
+            if self._pool is None:
+                # spawn, not fork: the server already runs threads that a forked child would inherit mid-flight
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+        started = time.perf_counter()
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.latency[operation].record(elapsed)
+            metrics.password_duration.observe(elapsed, operation)
+
+    def _release(self, _):
+        with self._lock:
+            self._pending -= 1
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = self._pending
+        return {
+            "workers": self.workers,
+            "pending": pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "rounds": BCRYPT_ROUNDS,
+            **{f"{name}_latency": latency.stats() for name, latency in self.latency.items()},
+        }
+
+
+hasher = PasswordHasher(workers=PASSWORD_WORKERS, max_pending=PASSWORD_QUEUE_DEPTH)
@@ -0,0 +1,86 @@
+import hashlib
+import io
+import os
+import re
+from uuid import uuid4
+from fastapi.staticfiles import StaticFiles
+from src.config import AVATAR_DIR, AVATAR_MAX_PIXELS, AVATAR_SIZES, AVATAR_QUALITY, AVATAR_CACHE_SECONDS
+
+# <hash>-<size>.webp, the largest variant is the one stored in User.avatar
+_VARIANT = re.compile(r"^(?P<base>.*[0-9a-f]{32})-\d+\.webp$")
+
+
+class InvalidImage(Exception):
+    pass
+
+
+def avatar_variants(avatar: str) -> dict[int, str]:
+    match = _VARIANT.match(avatar or "")
+    if match is None:
+        # an empty avatar or an original uploaded before variants existed
+        return {}
+    return {size: f"{match['base']}-{size}.webp" for size in AVATAR_SIZES}
+
+
+def _decode(data: bytes):
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        # the header is enough to refuse decompression bombs before any pixels are decoded
+        if image.width * image.height > AVATAR_MAX_PIXELS:
+            raise InvalidImage(f"Image is larger than {AVATAR_MAX_PIXELS} pixels")
+        # JPEG can decode straight at a fraction of the resolution, much cheaper for camera photos
+        image.draft("RGB", (max(AVATAR_SIZES), max(AVATAR_SIZES)))
+        image = ImageOps.exif_transpose(image)
+        return image.convert("RGBA" if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info else "RGB")
+    except InvalidImage:
+        raise
+    except UnidentifiedImageError as e:
+        raise InvalidImage("Not a supported image format") from e
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise InvalidImage(f"Unreadable image: {e}") from e
+
+
+def _encode(image, size: int) -> bytes:
+    from PIL import Image, ImageOps
+
+    variant = ImageOps.fit(image, (size, size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    variant.save(buffer, "WEBP", quality=AVATAR_QUALITY)
+    return buffer.getvalue()
+
+
+def save_avatar(data: bytes) -> str:
+    image = _decode(data)
+    variants = {size: _encode(image, size) for size in sorted(AVATAR_SIZES)}
+    # hashing the encoded output, not the upload, so new sizes or quality never reuse a cached name
+    digest = hashlib.sha256()
+    for encoded in variants.values():
+        digest.update(encoded)
+    base = os.path.join(AVATAR_DIR, digest.hexdigest()[:32])
+    for size, encoded in variants.items():
+        path = f"{base}-{size}.webp"
+        if os.path.exists(path):
+            continue
+        partial = f"{path}.{uuid4()}.tmp"
+        with open(partial, "wb") as out:
+            out.write(encoded)
+        os.replace(partial, path)
+    return f"{base}-{max(AVATAR_SIZES)}.webp"
+
+
+def remove_avatar(avatar: str):
+    for path in avatar_variants(avatar).values() or [avatar]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class AvatarFiles(StaticFiles):
+    # avatar files are never rewritten under the same name, so clients may keep them for good
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("Cache-Control", f"public, max-age={AVATAR_CACHE_SECONDS}, immutable")
+        return response
@@ -0,0 +1,107 @@
+import asyncio
+import bisect
+from collections import OrderedDict
+from typing import Optional
+import orjson
+from src.db import Tasks, Level, shared_state
+from src.config import CATALOG_CACHE_PAGES
+
+TASK_FIELDS = ("id", "name", "description", "level", "db_path", "price")
+
+
+def _build_index(rows: list[dict]) -> dict:
+    # keyset order is the id as text, the same order the database pages in
+    rows.sort(key=lambda row: str(row["id"]))
+    index = {None: ([], [])}
+    for row in rows:
+        for level in (None, Level(row["level"])):
+            ids, level_rows = index.setdefault(level, ([], []))
+            ids.append(str(row["id"]))
+            level_rows.append(row)
+    return index
+
+
+def _encode_page(index: dict, cursor: Optional[str], limit: int, level: Optional[Level], fields: list[str]) -> bytes:
+    ids, rows = index.get(level, ((), ()))
+    start = bisect.bisect_right(ids, cursor) if cursor is not None else 0
+    page = rows[start:start + limit + 1]
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = str(page[-1]["id"])
+    return orjson.dumps({
+        "result": [{field: row[field] for field in fields} for row in page],
+        "next_cursor": next_cursor,
+    })
+
+
+# The task list only changes on upload, so pages are kept as ready JSON bytes until the version moves
+class Catalog:
+    def __init__(self, max_pages: int, state=None):
+        self.max_pages = max_pages
+        self.state = state
+        self.version = 0
+        self._index: Optional[dict] = None
+        self._pages: OrderedDict[tuple, bytes] = OrderedDict()
+        self._loading = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        if state is not None:
+            state.subscribe("catalog", self._changed)
+
+    async def start(self):
+        # the version is shared by all workers, so they agree on it and an ETag is valid everywhere
+        if self.state is not None:
+            self._reset(await self.state.version("catalog"))
+
+    async def invalidate(self):
+        version = await self.state.bump("catalog") if self.state is not None else self.version + 1
+        self._reset(version)
+        if self.state is not None:
+            self.state.publish("catalog", str(version))
+
+    def _changed(self, payload: str):
+        self._reset(max(self.version, int(payload)))
+
+    def _reset(self, version: int):
+        self.version = version
+        self._index = None
+        self._pages.clear()
+
+    async def page(self, cursor: Optional[str], limit: int, level: Optional[Level], fields: list[str]) -> bytes:
+        key = (self.version, cursor, limit, level, tuple(fields))
+        body = self._pages.get(key)
+        if body is not None:
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return body
+        self.misses += 1
+        body = _encode_page(await self._load(), cursor, limit, level, fields)
+        # an upload during the load means these rows may already be stale for the new version
+        if key[0] == self.version:
+            self._pages[key] = body
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return body
+
+    async def _load(self) -> dict:
+        async with self._loading:
+            if self._index is not None:
+                return self._index
+            version = self.version
+            index = _build_index(await Tasks.all().values(*TASK_FIELDS))
+            if version == self.version:
+                self._index = index
+            return index
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "tasks": len(self._index[None][0]) if self._index is not None else None,
+            "pages": len(self._pages),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+catalog = Catalog(max_pages=CATALOG_CACHE_PAGES, state=shared_state)
@@ -0,0 +1,81 @@
+import json
+from typing import Optional
+from src.db import User, shared_state
+from .ranking import RankedSet
+
+PROFILE_FIELDS = ("name", "username", "description", "avatar", "points")
+
+
+class Leaderboard:
+    def __init__(self, state=None):
+        self._profiles: dict[str, dict] = {}
+        self._ranking = RankedSet()
+        self.version = 0
+        self.state = state
+        if state is not None:
+            state.subscribe("leaderboard", self._refresh)
+
+    async def rebuild(self):
+        profiles = await User.all().values(*PROFILE_FIELDS)
+        self._profiles = {}
+        self._ranking = RankedSet()
+        for profile in profiles:
+            self._add(profile)
+        self.version += 1
+
+    def upsert(self, user: User, previous_username: Optional[str] = None):
+        self.remove(previous_username or user.username)
+        self._add({field: getattr(user, field) for field in PROFILE_FIELDS})
+        self.version += 1
+        if self.state is not None:
+            self.state.publish("leaderboard", json.dumps([user.username, previous_username]))
+
+    async def _refresh(self, payload: str):
+        # another worker changed this user, reload the profile from the database
+        username, previous_username = json.loads(payload)
+        if previous_username:
+            self.remove(previous_username)
+        profile = await User.filter(username=username).first().values(*PROFILE_FIELDS)
+        self.remove(username)
+        if profile:
+            self._add(profile)
+        self.version += 1
+
+    def remove(self, username: str):
+        profile = self._profiles.pop(username, None)
+        if profile is not None:
+            self._ranking.remove((-profile["points"], username))
+            self.version += 1
+
+    def _add(self, profile: dict):
+        self._profiles[profile["username"]] = profile
+        self._ranking.insert((-profile["points"], profile["username"]))
+
+    def profile(self, username: str) -> Optional[dict]:
+        return self._profiles.get(username)
+
+    def top(self, limit: int) -> list[dict]:
+        return [self._profiles[username] for _, username in self._ranking.slice(0, limit)]
+
+    def rank(self, username: str) -> Optional[int]:
+        # competition ranking: users with equal points share a rank
+        profile = self._profiles.get(username)
+        if profile is None:
+            return None
+        return self._ranking.rank((-profile["points"], "")) + 1
+
+    def around(self, username: str, radius: int) -> list[tuple[int, dict]]:
+        profile = self._profiles.get(username)
+        if profile is None:
+            return []
+        position = self._ranking.rank((-profile["points"], username))
+        return [
+            (self._ranking.rank((points, "")) + 1, self._profiles[name])
+            for points, name in self._ranking.slice(position - radius, position + radius + 1)
+        ]
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+
+leaderboard = Leaderboard(shared_state)
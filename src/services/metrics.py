@@ -0,0 +1,230 @@
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+from starlette.concurrency import run_in_threadpool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    # every uvicorn worker keeps its own registry and a scrape reaches only one of them,
+    # the label keeps their series apart so they can be summed instead of overwriting each other
+    pairs.append(f'worker="{os.getpid()}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(labels) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[labels] = (counts, total + value)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        lines = self.header()
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Metric] = []
+        self._collectors: list[Callable] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Callable):
+        # collectors refresh gauges right before a scrape, e.g. from a directory listing
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            collect()
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")))
+requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"))
+request_orm_queries = registry.register(Histogram(
+    "http_request_orm_queries", "ORM queries issued while serving one request", ("route",), COUNT_BUCKETS))
+learner_sql_duration = registry.register(Histogram(
+    "learner_sql_duration_seconds", "Time spent executing and fetching learner queries"))
+learner_sql_rows = registry.register(Histogram(
+    "learner_sql_rows", "Rows returned by one learner query", buckets=ROW_BUCKETS))
+password_duration = registry.register(Histogram(
+    "password_hash_duration_seconds", "bcrypt hash and verify time including the queue", ("operation",)))
+sandboxes_total = registry.register(Gauge(
+    "sandboxes", "Learner sandboxes by where they live", ("location",)))
+sandbox_bytes = registry.register(Gauge(
+    "sandbox_bytes", "Learner sandbox size by where it lives", ("location",)))
+
+
+_orm_queries: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("orm_queries", default=None)
+
+
+class _QueryCounter(logging.Filter):
+    # tortoise logs every statement it sends at DEBUG on this logger; the level is lowered only while
+    # a request is being counted, and the records nobody asked for are dropped here after counting,
+    # so propagation and the app's own warnings and errors on this logger stay as they were
+    def __init__(self, logger: logging.Logger):
+        super().__init__()
+        self.logger = logger
+        self.level = logger.level
+        self.threshold = logger.getEffectiveLevel()
+        self.active = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        counter = _orm_queries.get()
+        if counter is not None and record.levelno == logging.DEBUG:
+            counter[0] += 1
+        return record.levelno >= self.threshold
+
+    def start(self):
+        if self.active == 0:
+            self.level = self.logger.level
+            self.threshold = self.logger.getEffectiveLevel()
+            self.logger.setLevel(min(self.threshold, logging.DEBUG))
+        self.active += 1
+
+    def stop(self):
+        self.active -= 1
+        if self.active == 0:
+            self.logger.setLevel(self.level)
+
+
+def count_orm_queries() -> _QueryCounter:
+    logger = logging.getLogger("tortoise.db_client")
+    for existing in logger.filters:
+        if isinstance(existing, _QueryCounter):
+            return existing
+    counter = _QueryCounter(logger)
+    logger.addFilter(counter)
+    return counter
+
+
+class MetricsMiddleware:
+    def __init__(self, app, path: str = "/metrics"):
+        self.app = app
+        self.path = path
+        self.orm_queries = count_orm_queries()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["path"] == self.path:
+            body = (await run_in_threadpool(registry.render)).encode()
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", CONTENT_TYPE.encode()), (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        status = 500
+        queries = [0]
+        token = _orm_queries.set(queries)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        self.orm_queries.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            requests_in_flight.dec()
+            self.orm_queries.stop()
+            _orm_queries.reset(token)
+            # the route template, not the raw path, so ids don't explode the label set
+            route = getattr(scope.get("route"), "path", "unmatched")
+            requests_total.inc(scope["method"], route, status)
+            request_duration.observe(elapsed, scope["method"], route)
+            request_orm_queries.observe(queries[0], route)
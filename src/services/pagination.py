@@ -0,0 +1,31 @@
+from typing import Optional
+from fastapi import HTTPException
+from tortoise.queryset import QuerySet
+
+
+def parse_fields(fields: Optional[str], allowed: tuple[str, ...], key: str) -> list[str]:
+    if not fields:
+        return list(allowed)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # the keyset column is always selected, the next cursor is built from it
+    return list(dict.fromkeys([key, *requested]))
+
+
+async def keyset_page(
+    queryset: QuerySet,
+    key: str,
+    fields: list[str],
+    cursor: Optional[str],
+    limit: int
+) -> tuple[list[dict], Optional[str]]:
+    if cursor is not None:
+        queryset = queryset.filter(**{f"{key}__gt": cursor})
+    rows = await queryset.order_by(key).limit(limit + 1).values(*fields)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1][key])
+    return rows, next_cursor
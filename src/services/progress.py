@@ -0,0 +1,68 @@
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+from src.db import User, Results, UserStats, Tasks
+from src.db.migrations import user_stats_backfill
+from src.schemas.tasks import Task, \
+                              ResultResponseSchema, \
+                              UserTaskStatistics, \
+                              UserProgressResponse
+from src.schemas.user import UserResponseSchema
+
+
+async def record_completion(user: User, task: Tasks, points: int):
+    # must run inside the same transaction that creates the Results row
+    if points <= 0:
+        return
+    stats, _ = await UserStats.get_or_create(user=user)
+    level_field = UserStats.LEVEL_FIELDS[task.level]
+    await UserStats.filter(id=stats.id).update(**{
+        "total_points": F("total_points") + points,
+        "total_completed": F("total_completed") + 1,
+        level_field: F(level_field) + 1,
+    })
+
+
+async def get_user_progress(user: User) -> UserProgressResponse:
+    stats = await UserStats.get_or_none(user=user)
+
+    recent_results = await Results.filter(
+        user=user
+    ).limit(10).prefetch_related('task')
+
+    recent_results_schema = [
+        ResultResponseSchema(
+            id=result.id,
+            task=Task(
+                id=result.task.id,
+                name=result.task.name,
+                description=result.task.description,
+                level=result.task.level,
+                db_path=result.task.db_path,
+                price=result.task.price
+            ),
+            user=UserResponseSchema(
+                name=user.name,
+                username=user.username,
+                description=user.description,
+                avatar=user.avatar,
+                points=user.points
+            ),
+            points_earned=result.points_earned
+        )
+        for result in recent_results
+    ]
+
+    statistics = UserTaskStatistics(
+        total_tasks_completed=stats.total_completed if stats else 0,
+        total_points_earned=stats.total_points if stats else 0,
+        tasks_by_level=stats.tasks_by_level() if stats else {},
+        recent_results=recent_results_schema
+    )
+
+    return UserProgressResponse(statistics=statistics)
+
+
+async def backfill_user_stats() -> int:
+    # the same rebuild migration 6 runs on upgrade, kept in one place
+    async with in_transaction() as conn:
+        return await user_stats_backfill(conn)
@@ -0,0 +1,112 @@
+import random
+from typing import Any, Iterator, Optional
+
+MAX_LEVEL = 32
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next: list[Optional["_Node"]] = [None] * levels
+        self.width = [1] * levels
+
+
+class RankedSet:
+    # indexable skip list: insert, remove, rank and positional access in O(log n)
+
+    def __init__(self):
+        self._head = _Node(None, MAX_LEVEL)
+        self._head.width = [0] * MAX_LEVEL
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_levels(self) -> int:
+        levels = 1
+        while levels < MAX_LEVEL and random.random() < 0.5:
+            levels += 1
+        return levels
+
+    def insert(self, key: Any):
+        chain = [self._head] * MAX_LEVEL
+        positions = [0] * MAX_LEVEL
+        node, position = self._head, 0
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+
+        levels = self._random_levels()
+        new = _Node(key, levels)
+        for level in range(MAX_LEVEL):
+            previous = chain[level]
+            if level < levels:
+                new.next[level] = previous.next[level]
+                previous.next[level] = new
+                # distance from the predecessor to the new node at this level
+                offset = position - positions[level] + 1
+                new.width[level] = previous.width[level] - offset + 1 if new.next[level] is not None else 0
+                previous.width[level] = offset
+            elif previous.next[level] is not None:
+                previous.width[level] += 1
+        self._size += 1
+
+    def remove(self, key: Any) -> bool:
+        chain = [self._head] * MAX_LEVEL
+        node = self._head
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            return False
+
+        for level in range(MAX_LEVEL):
+            previous = chain[level]
+            if previous.next[level] is target:
+                previous.next[level] = target.next[level]
+                previous.width[level] = previous.width[level] + target.width[level] - 1 if target.next[level] is not None else 0
+            elif previous.next[level] is not None:
+                previous.width[level] -= 1
+        self._size -= 1
+        return True
+
+    def rank(self, key: Any) -> int:
+        # number of keys strictly smaller than key
+        node, position = self._head, 0
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def at(self, index: int) -> Any:
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        node, position = self._head, -1
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and position + node.width[level] <= index:
+                position += node.width[level]
+                node = node.next[level]
+        return node.key
+
+    def slice(self, start: int, stop: int) -> Iterator[Any]:
+        start = max(start, 0)
+        if start >= min(stop, self._size):
+            return
+        node, position = self._head, -1
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and position + node.width[level] <= start:
+                position += node.width[level]
+                node = node.next[level]
+        while node is not None and position < stop:
+            yield node.key
+            node = node.next[0]
+            position += 1
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import posixpath
+import sqlite3
+import tarfile
+import zipfile
+import zlib
+from uuid import uuid4
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from tortoise.transactions import in_transaction
+from src.config import IMPORT_WORKERS, IMPORT_MANIFEST_MAX_BYTES
+from src.db import Tasks, AnswerMode
+from src.schemas.tasks import ImportTaskSchema, ImportedTaskSchema, ImportFailureSchema, ImportTasksResponseSchema
+from src.sandbox import template_store, schema_cache, executor, limits_for, \
+                        ExecutorSaturated, QueryTimeout, BudgetExceeded, InvalidTemplate
+from src.sandbox.queries import fingerprint_template
+from .catalog import catalog
+
+MANIFEST = "manifest.json"
+
+
+class InvalidArchive(Exception):
+    pass
+
+
+class InvalidEntry(Exception):
+    pass
+
+
+def _name(name: str) -> str:
+    return posixpath.normpath(name).lstrip("/")
+
+
+def _members(source):
+    if zipfile.is_zipfile(source):
+        source.seek(0)
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    with archive.open(info) as member:
+                        yield _name(info.filename), member
+        return
+    source.seek(0)
+    # "r|*" reads the tar front to back, any compression, without seeking back for the index
+    with tarfile.open(fileobj=source, mode="r|*") as archive:
+        for info in archive:
+            if info.isfile():
+                yield _name(info.name), archive.extractfile(info)
+
+
+def _read_manifest(member) -> list:
+    data = member.read(IMPORT_MANIFEST_MAX_BYTES + 1)
+    if len(data) > IMPORT_MANIFEST_MAX_BYTES:
+        raise InvalidArchive(f"{MANIFEST} is larger than {IMPORT_MANIFEST_MAX_BYTES} bytes")
+    try:
+        manifest = json.loads(data)
+    except ValueError as e:
+        raise InvalidArchive(f"{MANIFEST} is not valid JSON: {e}") from e
+    # either a bare list of tasks or {"tasks": [...]}
+    entries = manifest.get("tasks") if isinstance(manifest, dict) else manifest
+    if not isinstance(entries, list):
+        raise InvalidArchive(f"{MANIFEST} must hold a list of tasks")
+    return entries
+
+
+def _unpack(source) -> tuple[list, dict]:
+    # one pass over the archive: the manifest may come after the templates, so every .sqlite member
+    # is streamed into the store right away and matched to the manifest afterwards
+    entries = None
+    received = {}
+    try:
+        for name, member in _members(source):
+            if name == MANIFEST:
+                entries = _read_manifest(member)
+            elif name.endswith(".sqlite") and name not in received:
+                try:
+                    received[name] = template_store.receive(member)
+                except InvalidTemplate as e:
+                    received[name] = e
+        if entries is None:
+            raise InvalidArchive(f"{MANIFEST} is missing from the archive")
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, zlib.error) as e:
+        _discard(received)
+        raise InvalidArchive(f"Expected a zip or tar archive: {e}") from e
+    except BaseException:
+        _discard(received)
+        raise
+    return entries, received
+
+
+def _discard(received: dict):
+    for value in received.values():
+        if isinstance(value, tuple):
+            template_store.discard(value[0])
+
+
+async def import_archive(source) -> ImportTasksResponseSchema:
+    entries, received = await run_in_threadpool(_unpack, source)
+    semaphore = asyncio.Semaphore(IMPORT_WORKERS)
+    published: dict[str, asyncio.Future] = {}
+
+    async def publish(name: str) -> tuple[str, str]:
+        partial, template_hash = received[name]
+        async with semaphore:
+            path = await run_in_threadpool(template_store.publish, partial, template_hash)
+            try:
+                await executor.run(schema_cache.template, template_hash, path)
+            except (ExecutorSaturated, sqlite3.Error) as e:
+                raise InvalidTemplate(str(e)) from e
+        return template_hash, path
+
+    async def prepare(entry) -> Tasks:
+        if not isinstance(entry, dict):
+            raise InvalidEntry("Manifest entry must be an object")
+        task_data = ImportTaskSchema(**entry)
+        name = _name(task_data.file)
+        value = received.get(name)
+        if value is None:
+            raise InvalidEntry(f"{task_data.file} is not in the archive")
+        if isinstance(value, Exception):
+            raise value
+        # entries sharing a template wait on the same check instead of repeating it
+        if name not in published:
+            published[name] = asyncio.ensure_future(publish(name))
+        template_hash, path = await published[name]
+
+        answer_fingerprint = None
+        if task_data.answer_mode == AnswerMode.RESULT:
+            async with semaphore:
+                answer_fingerprint = await executor.run(
+                    fingerprint_template,
+                    path,
+                    task_data.answer,
+                    limits_for(task_data.level),
+                    task_data.answer_ordered,
+                    task_data.answer_precision
+                )
+
+        return Tasks(
+            id=uuid4(),
+            name=task_data.name,
+            description=task_data.description,
+            level=task_data.level,
+            db_path=path,
+            template_hash=template_hash,
+            answer=task_data.answer,
+            price=task_data.price,
+            answer_mode=task_data.answer_mode,
+            answer_fingerprint=answer_fingerprint,
+            answer_ordered=task_data.answer_ordered,
+            answer_precision=task_data.answer_precision
+        )
+
+    async def attempt(entry):
+        try:
+            return await prepare(entry)
+        except (InvalidEntry, ValidationError) as e:
+            return e
+        except InvalidTemplate as e:
+            return InvalidEntry(f"Invalid task database: {e}")
+        except (ExecutorSaturated, QueryTimeout, BudgetExceeded, sqlite3.Error) as e:
+            return InvalidEntry(f"Reference query failed: {e}")
+
+    try:
+        results = await asyncio.gather(*(attempt(entry) for entry in entries))
+    finally:
+        if published:
+            await asyncio.gather(*published.values(), return_exceptions=True)
+        await run_in_threadpool(_discard, received)
+
+    report = ImportTasksResponseSchema(imported=[], failed=[])
+    tasks = []
+    for index, (entry, result) in enumerate(zip(entries, results)):
+        file = entry.get("file") if isinstance(entry, dict) else None
+        if isinstance(result, Tasks):
+            tasks.append(result)
+            report.imported.append(ImportedTaskSchema(index=index, file=str(file), task_id=str(result.id), name=result.name))
+        else:
+            report.failed.append(ImportFailureSchema(index=index, file=None if file is None else str(file), error=str(result)))
+
+    if tasks:
+        async with in_transaction():
+            await Tasks.bulk_create(tasks)
+        await catalog.invalidate()
+    return report
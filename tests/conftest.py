@@ -0,0 +1,29 @@
+import sqlite3
+import pytest
+from src.sandbox import queries
+from src.sandbox.backend import FileSandboxBackend, MemorySandboxBackend
+from src.sandbox.governor import LEVEL_LIMITS
+from src.sandbox.templates import TemplateCache
+from src.db.models.base import Level
+
+LIMITS = LEVEL_LIMITS[Level.BEGINNER]
+SOLUTION = "00000000-0000-0000-0000-000000000001"
+PAGE_SIZE = 2
+
+
+@pytest.fixture(params=["file", "memory"])
+def sandboxes(request, tmp_path, monkeypatch):
+    # one learner sandbox with t(x) = 1, 2, 3, installed as the backend the query functions use
+    template = tmp_path / "template.sqlite"
+    with sqlite3.connect(template) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(1,), (2,), (3,)])
+    directory = tmp_path / "sandboxes"
+    directory.mkdir()
+    if request.param == "file":
+        backend = FileSandboxBackend(str(directory))
+    else:
+        backend = MemorySandboxBackend(str(directory), TemplateCache(max_bytes=1 << 20), max_bytes=1 << 20)
+    backend.provision(SOLUTION, "template", str(template))
+    monkeypatch.setattr(queries, "sandboxes", backend)
+    return backend
@@ -0,0 +1,45 @@
+import sqlite3
+import pytest
+from src.services import metrics
+from src.sandbox import queries
+from src.sandbox.slowlog import SlowQueryLog
+from tests.conftest import SOLUTION, LIMITS, PAGE_SIZE
+
+
+def _observations(histogram) -> int:
+    counts, _ = histogram._values.get((), ([0], 0.0))
+    return sum(counts)
+
+
+@pytest.fixture
+def slow_log(monkeypatch):
+    log = SlowQueryLog(threshold_ms=0, max_entries=10)
+    monkeypatch.setattr(queries, "slow_queries", log)
+    return log
+
+
+@pytest.mark.parametrize("statement", ["INSERT INTO t VALUES (4)", "UPDATE t SET x = x + 1", "CREATE TABLE u (y)"])
+@pytest.mark.parametrize("run", [
+    lambda statement: queries.run_query(SOLUTION, statement, LIMITS),
+    lambda statement: queries.page_query(SOLUTION, statement, LIMITS, PAGE_SIZE),
+], ids=["all", "page"])
+def test_statement_without_rows_is_closed(sandboxes, slow_log, statement, run):
+    durations = _observations(metrics.learner_sql_duration)
+    rows = _observations(metrics.learner_sql_rows)
+
+    cursor, result = run(statement)
+
+    assert result == [] and cursor.done
+    assert [entry["count"] for entry in slow_log.entries()] == [1]
+    assert _observations(metrics.learner_sql_duration) == durations + 1
+    assert _observations(metrics.learner_sql_rows) == rows + 1
+    if sandboxes.name == "file":
+        # the handle is the sandbox connection, a closed one refuses everything
+        with pytest.raises(sqlite3.ProgrammingError):
+            cursor.handle.conn.execute("SELECT 1")
+
+
+def test_select_is_recorded_once_drained(sandboxes, slow_log):
+    cursor, result = queries.run_query(SOLUTION, "SELECT x FROM t", LIMITS)
+    assert len(result) == 3 and cursor.done
+    assert [entry["max_rows"] for entry in slow_log.entries()] == [3]
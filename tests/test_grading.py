@@ -0,0 +1,36 @@
+import sqlite3
+import pytest
+from src.sandbox import queries
+from tests.conftest import SOLUTION, LIMITS
+
+
+def _rows(backend) -> list:
+    with backend.connect(SOLUTION) as conn:
+        return conn.execute("SELECT x FROM t ORDER BY x").fetchall()
+
+
+@pytest.mark.parametrize("answer", [
+    "DROP TABLE t",
+    "DELETE FROM t",
+    "ALTER TABLE t RENAME TO u",
+    "CREATE TABLE extra (y)",
+])
+def test_grading_leaves_sandbox_unchanged(sandboxes, answer):
+    queries.fingerprint_solution(SOLUTION, answer, LIMITS, ordered=False, precision=None)
+    assert _rows(sandboxes) == [(1,), (2,), (3,)]
+    with sandboxes.connect(SOLUTION) as conn:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    assert tables == ["t"]
+
+
+@pytest.mark.parametrize("answer", ["COMMIT", "END", "RELEASE anything"])
+def test_grading_refuses_to_end_its_transaction(sandboxes, answer):
+    with pytest.raises(sqlite3.DatabaseError):
+        queries.fingerprint_solution(SOLUTION, answer, LIMITS, ordered=False, precision=None)
+    assert _rows(sandboxes) == [(1,), (2,), (3,)]
+
+
+def test_grading_still_fingerprints_selects(sandboxes):
+    first = queries.fingerprint_solution(SOLUTION, "SELECT x FROM t", LIMITS, ordered=False, precision=None)
+    second = queries.fingerprint_solution(SOLUTION, "SELECT x FROM t ORDER BY x DESC", LIMITS, ordered=False, precision=None)
+    assert first == second